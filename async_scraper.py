@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+from scraper import URL, HEADERS, CARAT_RANGES, build_payload, parse_items
+from columnar import PageWriter, coerce_frame
+from planner import Slice, plan, root_slices, slice_label
+from transport import AsyncTransport
+
+# Async crawl mode for scraper.py: every (carat range, natural/lab) slice is
+# fetched at once through one AsyncTransport, which holds the shared
+# concurrency limit, request-rate budget, retries and captcha cool-down.
+# Page 1 of each slice is reused for its items instead of being fetched twice.
+
+def slice_payload(s, page):
+    return build_payload(page, s.is_lab, s.carat_min, s.carat_max,
+                         price_min=s.price_min, price_max=s.price_max, shape_id=s.shape_id)
+
+class Crawler:
+    def __init__(self, transport, sink, url=URL, store=None, run_id=None, delta=False):
+        self.transport = transport
+        self.sink = sink
+        self.pages = PageWriter(sink)
+        self.url = url
+        # Optional CrawlStore: pages are checkpointed as they arrive
+        self.store = store
+        self.run_id = run_id
+        self.delta = delta
+        self.new = 0
+        self.changed = 0
+        self.failed = 0
+
+    def save(self, s, page, raw_items):
+        start = time.perf_counter()
+        # With a store, the sink is filled from it once the run is complete
+        if self.store is None:
+            n = self.pages.write(raw_items)
+        else:
+            records = parse_items(raw_items)
+            new, changed = self.store.save_page(self.run_id, s, page, records, self.delta)
+            self.new += new
+            self.changed += changed
+            n = len(records)
+        self.transport.telemetry.page(slice_label(s), n, time.perf_counter() - start)
+        return n
+
+    async def fetch(self, s, page):
+        response = await self.transport.post(self.url, json=slice_payload(s, page), label=slice_label(s))
+        data = response.json() if response.status_code == 200 else None
+        if not data or not data.get("data"):
+            return None
+        return data["data"]["searchByIDs"]
+
+    async def first_page(self, s):
+        try:
+            search = await self.fetch(s, 1)
+        except Exception as e:
+            print(f"  Error on first request ({slice_label(s)}): {e}")
+            self.failed += 1
+            return None
+        if search is None:
+            self.failed += 1
+        return search
+
+    async def fetch_page(self, s, page):
+        try:
+            search = await self.fetch(s, page)
+        except Exception as e:
+            print(f"  Error on page {page} ({slice_label(s)}): {e}")
+            self.failed += 1
+            return 0
+        if search is None:
+            self.failed += 1
+            return 0
+        return self.save(s, page, search["items"])
+
+    async def scrape_slice(self, s, max_pages=25, search=None):
+        total_pages = None
+        if search is None and self.store is not None:
+            total_pages = self.store.slice_pages(self.run_id, s)
+        if search is None and total_pages is None:
+            search = await self.first_page(s)
+            if search is None:
+                return 0
+
+        if search is not None:
+            total_pages = min(search["numberOfPages"], max_pages)
+            print(f"  {slice_label(s)}: {search['total']} diamonds, scraping {total_pages} pages")
+            if self.store is not None:
+                self.store.save_slice(self.run_id, s, search["total"], total_pages)
+
+        done = self.store.completed_pages(self.run_id, s) if self.store is not None else set()
+        collected = 0
+        if search is not None and 1 not in done:
+            collected = self.save(s, 1, search["items"])
+
+        # Resumed slices have no probe response, so page 1 may still be due
+        first = 2 if search is not None else 1
+        pages = await asyncio.gather(*[
+            self.fetch_page(s, page) for page in range(first, total_pages + 1) if page not in done
+        ])
+        return collected + sum(pages)
+
+async def crawl(sink, carat_ranges=CARAT_RANGES, max_pages=25, concurrency=8, rate=4.0, url=URL,
+                adaptive=False, shape_ids=(1,), store=None, delta=False, resume=True, cache=None,
+                telemetry=None):
+    run_id = None
+    if store is not None:
+        run_id, delta, resumed = store.start_run(delta=delta, resume=resume)
+        print(f"  {'Resuming' if resumed else 'Starting'} run {run_id} ({'delta' if delta else 'full'} mode)")
+
+    async with AsyncTransport(HEADERS, cache=cache, concurrency=concurrency, rate=rate,
+                              telemetry=telemetry) as transport:
+        crawler = Crawler(transport, sink, url=url, store=store, run_id=run_id, delta=delta)
+
+        if store is not None and store.is_planned(run_id):
+            # Resuming: the stored plan replaces probing
+            leaves = [(s, None) for s, pages in store.slices(run_id)]
+        elif adaptive:
+            roots = root_slices(min(lo for lo, hi in carat_ranges), max(hi for lo, hi in carat_ranges), shape_ids)
+            previous = store.last_finished_run() if store is not None and delta else None
+            if previous is not None:
+                # The last plan's leaves are good roots: their probes are page 1
+                # anyway, and only leaves that have outgrown the cap get split.
+                # Empty leaves are stored too, so the plan still covers the
+                # roots and ranges that were empty last time get probed again
+                roots = [s for s, pages in store.slices(previous)]
+            leaves = await plan(crawler.first_page, roots, max_pages)
+            print(f"  Planned {len(leaves)} leaf slices with {transport.requests} probe requests")
+        else:
+            leaves = [(Slice(is_lab, carat_min, carat_max, shape_id=shape_id), None)
+                      for shape_id in shape_ids
+                      for carat_min, carat_max in carat_ranges
+                      for is_lab in (False, True)]
+
+        if store is not None and not store.is_planned(run_id):
+            for s, search in leaves:
+                if search is not None:
+                    store.save_slice(run_id, s, search["total"], min(search["numberOfPages"], max_pages))
+            # A failed probe loses its subtree from the plan, so only a complete
+            # plan replaces probing on resume
+            if adaptive and not crawler.failed:
+                store.mark_planned(run_id)
+
+        try:
+            counts = await asyncio.gather(*[
+                crawler.scrape_slice(s, max_pages, search) for s, search in leaves
+            ])
+        finally:
+            # Buffered rows reach the sink even if the crawl is interrupted,
+            # so its flushed parts can be resumed from
+            crawler.pages.flush()
+        print(f"  {transport.requests} requests in total ({transport.retries} retries)")
+
+    if store is not None:
+        if crawler.failed:
+            # Leave the run open so the next invocation retries the missing pages
+            print(f"  Run {run_id} incomplete: {crawler.failed} failed requests, rerun to resume")
+        else:
+            store.finish_run(run_id)
+        summary = store.run_summary(run_id)
+        print(f"  Run {run_id}: {summary['pages']} pages, {crawler.new} new listings, "
+              f"{crawler.changed} price changes, {summary['history_rows']} price_history rows")
+        for chunk in store.iter_run_listings(run_id):
+            sink.write_frame(coerce_frame(chunk))
+
+    return sum(counts)
+
+def run(sink, max_pages=25, concurrency=8, rate=4.0, url=URL, adaptive=False, shape_ids=(1,),
+        store_path=None, delta=False, resume=True, cache=None, telemetry=None):
+    from store import CrawlStore
+
+    store = CrawlStore(store_path) if store_path else None
+    start = time.perf_counter()
+    try:
+        collected = asyncio.run(crawl(sink, max_pages=max_pages, concurrency=concurrency, rate=rate, url=url,
+                                         adaptive=adaptive, shape_ids=shape_ids, store=store,
+                                         delta=delta, resume=resume, cache=cache, telemetry=telemetry))
+    finally:
+        if store is not None:
+            store.close()
+    print(f"\nAsync crawl: {collected} stones fetched in {time.perf_counter() - start:.1f}s")
+    return collected
@@ -0,0 +1,72 @@
+import argparse
+import time
+import warnings
+import numpy as np
+
+import features
+import ols
+from features import MODEL2_COLUMNS, MODEL3_COLUMNS, MODEL4_COLUMNS
+
+# Benchmark: models 2-4 with HC3 errors through statsmodels (one
+# OLS(...).fit(cov_type="HC3") each, reading params, pvalues, rsquared and
+# conf_int) against ols.fit_many (one shared QR). --scale resamples the
+# clean diamonds with replacement to that many times their size.
+#
+#   python bench_ols.py --scale 100
+
+SPECS = [MODEL2_COLUMNS, MODEL3_COLUMNS, MODEL4_COLUMNS]
+
+def statsmodels_path(fm, specs):
+    import statsmodels.api as sm
+    fits = []
+    for spec in specs:
+        fit = sm.OLS(fm.y(), fm.design(spec)).fit(cov_type="HC3")
+        fit.params, fit.pvalues, fit.rsquared, fit.conf_int()
+        fits.append(fit)
+    return fits
+
+def lean_path(fm, specs):
+    fits = ols.fit_many(fm, specs)
+    for fit in fits:
+        fit.params, fit.pvalues, fit.rsquared, fit.conf_int()
+    return fits
+
+def resampled(fm, scale, seed=0):
+    rows = np.random.default_rng(seed).integers(0, len(fm), size=len(fm) * scale)
+    return features.FeatureMatrix(fm.values[rows], fm.columns, fm.target[rows],
+                                  {name: values[rows] for name, values in fm.extras.items()})
+
+def measure(fn, fm, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fits = fn(fm, SPECS)
+        best = min(best, time.perf_counter() - start)
+    return best, fits
+
+def max_difference(reference, fits):
+    worst = {"params": 0.0, "bse (rel)": 0.0, "pvalues": 0.0, "rsquared": 0.0}
+    for ref, fit in zip(reference, fits):
+        worst["params"] = max(worst["params"], (fit.params - ref.params).abs().max())
+        worst["bse (rel)"] = max(worst["bse (rel)"], (fit.bse / ref.bse - 1).abs().max())
+        worst["pvalues"] = max(worst["pvalues"], (fit.pvalues - ref.pvalues).abs().max())
+        worst["rsquared"] = max(worst["rsquared"], abs(fit.rsquared - ref.rsquared))
+    return worst
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HC3 OLS: statsmodels vs ols.py")
+    parser.add_argument("--scale", type=int, nargs="*", default=[1, 100], help="dataset size multiples to run")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    base = features.load()
+    statsmodels_path(base, SPECS[:1])  # import and warm up
+    for scale in args.scale:
+        fm = base if scale == 1 else resampled(base, scale)
+        print(f"\n{len(fm)} rows x models 2-4 ({', '.join(str(len(spec) + 1) for spec in SPECS)} columns)")
+        sm_seconds, reference = measure(statsmodels_path, fm, args.rounds)
+        lean_seconds, fits = measure(lean_path, fm, args.rounds)
+        print(f"  statsmodels: {sm_seconds:8.3f}s")
+        print(f"  ols.py:      {lean_seconds:8.3f}s  ({sm_seconds / lean_seconds:.1f}x)")
+        print("  max difference: " + ", ".join(f"{name} {value:.1e}" for name, value in max_difference(reference, fits).items()))
@@ -0,0 +1,91 @@
+import argparse
+import gzip
+import json
+import os
+import time
+import tracemalloc
+import pandas as pd
+
+from scraper import parse_items
+from columnar import ColumnBuffer
+
+# Micro-benchmark: per-item dict building (scraper.parse_items + one big
+# pd.DataFrame) against columnar.ColumnBuffer on the same replayed pages.
+# Pages come from the HTTP replay cache if one was recorded, otherwise they
+# are rebuilt from diamonds_raw.csv in the searchByIDs shape.
+#
+#   python bench_parser.py --repeat 20      # ~300k stones
+
+def cached_pages(cache_dir):
+    pages = []
+    for dirpath, dirnames, filenames in os.walk(cache_dir):
+        for name in sorted(filenames):
+            if not name.endswith(".json.gz"):
+                continue
+            with gzip.open(os.path.join(dirpath, name), "rb") as f:
+                body = json.loads(json.loads(f.read())["body"])
+            search = (body.get("data") or {}).get("searchByIDs")
+            if search:
+                pages.append(search["items"])
+    return pages
+
+def rebuilt_pages(path="diamonds_raw.csv", size=50):
+    from stub_server import load_stones, to_item
+    stones = load_stones(path)
+    items = [to_item(row) for _, row in stones.iterrows()]
+    return [[items[i:i + size]] for i in range(0, len(items), size)]
+
+def dict_path(pages):
+    records = []
+    for items in pages:
+        records.extend(parse_items(items))
+    return pd.DataFrame(records)
+
+def columnar_path(pages, batch_size=5000):
+    # Batched the way PageWriter feeds the sink
+    buffer = ColumnBuffer()
+    frames = []
+    for items in pages:
+        buffer.extend(items)
+        if len(buffer) >= batch_size:
+            frames.append(buffer.to_frame())
+    if len(buffer):
+        frames.append(buffer.to_frame())
+    return pd.concat(frames, ignore_index=True)
+
+def measure(fn, pages, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        df = fn(pages)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(pages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark searchByIDs page parsing")
+    parser.add_argument("--cache-dir", default=".http_cache")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the page set this many times")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = cached_pages(args.cache_dir) if os.path.isdir(args.cache_dir) else []
+    source = "replay cache"
+    if not pages:
+        pages = rebuilt_pages()
+        source = "diamonds_raw.csv"
+    pages = pages * args.repeat
+    n_items = sum(len(parse_items(items)) for items in pages[:len(pages) // args.repeat]) * args.repeat
+    print(f"{len(pages)} pages, {n_items} stones (from {source})\n")
+
+    results = {}
+    for name, fn in [("dict records", dict_path), ("columnar", columnar_path)]:
+        seconds, peak, df = measure(fn, pages, args.rounds)
+        results[name] = seconds
+        print(f"{name:>13}: {seconds:7.3f}s  {n_items / seconds / 1e3:8.0f}k stones/s  "
+              f"peak {peak / 1e6:7.1f} MB  frame {df.memory_usage(deep=True).sum() / 1e6:6.1f} MB")
+
+    print(f"\nSpeed-up: {results['dict records'] / results['columnar']:.1f}x")
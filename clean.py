@@ -1,97 +1,194 @@
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load raw data
-df = pd.read_csv("diamonds_raw.csv")
-print(f"Raw dataset: {len(df)} rows")
-
-# ── 1. REMOVE OUTLIERS ───────────────────────────────────────────
-# Remove stones above 5 carats (very thin market, distort regression)
-df = df[df['carat'] <= 5.0]
-
-# Remove prices below $300 (data quality - these are all tiny melee stones)
-df = df[df['price_usd'] >= 300]
-
-# Remove extreme price outliers (above 99th percentile separately for natural and lab)
-nat_99 = df[df['is_lab']==False]['price_usd'].quantile(0.99)
-lab_99 = df[df['is_lab']==True]['price_usd'].quantile(0.99)
-df = df[~((df['is_lab']==False) & (df['price_usd'] > nat_99))]
-df = df[~((df['is_lab']==True) & (df['price_usd'] > lab_99))]
-
-print(f"After outlier removal: {len(df)} rows")
-
-# ── 2. ENCODE CATEGORICAL VARIABLES ─────────────────────────────
-# Cut: use existing cut_id (1=Good, 2=Very Good, 3=Excellent/Ideal)
-# Check what values we have
-print("\nCut distribution:")
-print(df.groupby(['cut_id','cut_name']).size())
-
-print("\nColor distribution:")
-print(df.groupby(['color_id','color_name']).size())
-
-print("\nClarity distribution:")
-print(df.groupby(['clarity_id','clarity_name']).size())
-
-print("\nCert distribution:")
-print(df['lab_cert'].value_counts())
-
-print("\nFluorescence distribution:")
-print(df['fluorescence'].value_counts())
-
-# ── 3. CREATE LOG VARIABLES ──────────────────────────────────────
-df['ln_price'] = np.log(df['price_usd'])
-df['ln_carat'] = np.log(df['carat'])
-
-# ── 4. CREATE ORIGIN DUMMY ───────────────────────────────────────
-# is_lab is already boolean - create int version for regression
-df['origin_natural'] = (~df['is_lab']).astype(int)  # 1=natural, 0=lab
-
-# ── 5. CREATE CERT DUMMY ─────────────────────────────────────────
-# GIA vs IGI is important - GIA commands premium
-df['cert_GIA'] = (df['lab_cert'] == 'GIA').astype(int)
-
-# ── 6. SUMMARY STATS ─────────────────────────────────────────────
-print("\n── CLEAN DATASET SUMMARY ──")
-print(f"Total diamonds: {len(df)}")
-print(f"Natural: {len(df[df['is_lab']==False])} | Lab: {len(df[df['is_lab']==True])}")
-print(f"\nPrice (USD):")
-print(df.groupby('is_lab')['price_usd'].describe().round(0))
-print(f"\nCarat:")
-print(df.groupby('is_lab')['carat'].describe().round(3))
-
-# ── 7. PLOT PRICE DISTRIBUTIONS ──────────────────────────────────
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-
-# Price distribution
-axes[0].hist(df[df['is_lab']==False]['ln_price'], bins=50, alpha=0.6, 
-             label='Natural', color='steelblue')
-axes[0].hist(df[df['is_lab']==True]['ln_price'], bins=50, alpha=0.6, 
-             label='Lab-grown', color='coral')
-axes[0].set_xlabel('ln(Price USD)')
-axes[0].set_ylabel('Count')
-axes[0].set_title('Log Price Distribution: Natural vs Lab-Grown')
-axes[0].legend()
-
-# Price vs carat scatter
-sample = df.sample(min(2000, len(df)))
-axes[1].scatter(sample[sample['is_lab']==False]['ln_carat'], 
-                sample[sample['is_lab']==False]['ln_price'],
-                alpha=0.3, s=10, label='Natural', color='steelblue')
-axes[1].scatter(sample[sample['is_lab']==True]['ln_carat'], 
-                sample[sample['is_lab']==True]['ln_price'],
-                alpha=0.3, s=10, label='Lab-grown', color='coral')
-axes[1].set_xlabel('ln(Carat)')
-axes[1].set_ylabel('ln(Price USD)')
-axes[1].set_title('Price vs Carat: Natural vs Lab-Grown')
-axes[1].legend()
-
-plt.tight_layout()
-plt.savefig('price_distributions.png', dpi=150)
-plt.show()
-print("\nPlot saved to price_distributions.png")
-
-# ── 8. SAVE CLEAN DATASET ────────────────────────────────────────
-df.to_csv("diamonds_clean.csv", index=False)
-print(f"\nClean dataset saved: {len(df)} rows → diamonds_clean.csv")
\ No newline at end of file
+
+import dataset
+from sketch import TDigest
+
+# Two modes. The default loads diamonds_raw whole. --chunked streams it
+# twice: the first pass builds per-origin t-digests (see sketch.py) for the
+# 99th percentile price cut-offs, and the second filters and derives columns
+# chunk by chunk into diamonds_clean.parquet, so memory is bounded by
+# --chunk-size rather than by the crawl history. --check compares the
+# sketched cut-offs with exact quantiles on the current data. --no-plots
+# skips price_distributions.png and never imports matplotlib.
+
+MAX_CARAT = 5.0
+MIN_PRICE = 300
+PRICE_QUANTILE = 0.99
+
+def in_range(df):
+    # Remove stones above 5 carats (very thin market, distort regression)
+    # and prices below $300 (data quality - these are all tiny melee stones)
+    return df[(df['carat'] <= MAX_CARAT) & (df['price_usd'] >= MIN_PRICE)]
+
+def below_cutoffs(df, nat_cut, lab_cut):
+    # Remove extreme price outliers (above the cut-off separately for natural and lab)
+    df = df[~((df['is_lab']==False) & (df['price_usd'] > nat_cut))]
+    return df[~((df['is_lab']==True) & (df['price_usd'] > lab_cut))]
+
+def derive(df):
+    # Log variables
+    df['ln_price'] = np.log(df['price_usd'])
+    df['ln_carat'] = np.log(df['carat'])
+    # is_lab is already boolean - create int version for regression
+    df['origin_natural'] = (~df['is_lab']).astype(int)  # 1=natural, 0=lab
+    # GIA vs IGI is important - GIA commands premium
+    df['cert_GIA'] = (df['lab_cert'] == 'GIA').astype(int)
+    return df
+
+def plot_distributions(df):
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Price distribution
+    axes[0].hist(df[df['is_lab']==False]['ln_price'], bins=50, alpha=0.6, 
+                 label='Natural', color='steelblue')
+    axes[0].hist(df[df['is_lab']==True]['ln_price'], bins=50, alpha=0.6, 
+                 label='Lab-grown', color='coral')
+    axes[0].set_xlabel('ln(Price USD)')
+    axes[0].set_ylabel('Count')
+    axes[0].set_title('Log Price Distribution: Natural vs Lab-Grown')
+    axes[0].legend()
+
+    # Price vs carat scatter
+    sample = df.sample(min(2000, len(df)))
+    axes[1].scatter(sample[sample['is_lab']==False]['ln_carat'], 
+                    sample[sample['is_lab']==False]['ln_price'],
+                    alpha=0.3, s=10, label='Natural', color='steelblue')
+    axes[1].scatter(sample[sample['is_lab']==True]['ln_carat'], 
+                    sample[sample['is_lab']==True]['ln_price'],
+                    alpha=0.3, s=10, label='Lab-grown', color='coral')
+    axes[1].set_xlabel('ln(Carat)')
+    axes[1].set_ylabel('ln(Price USD)')
+    axes[1].set_title('Price vs Carat: Natural vs Lab-Grown')
+    axes[1].legend()
+
+    plt.tight_layout()
+    plt.savefig('price_distributions.png', dpi=150)
+    plt.show()
+    print("\nPlot saved to price_distributions.png")
+
+def clean_in_memory(plots=True):
+    # Load raw data
+    df = dataset.load("diamonds_raw")
+    print(f"Raw dataset: {len(df)} rows")
+
+    # ── 1. REMOVE OUTLIERS ───────────────────────────────────────────
+    df = in_range(df)
+    nat_99 = df[df['is_lab']==False]['price_usd'].quantile(PRICE_QUANTILE)
+    lab_99 = df[df['is_lab']==True]['price_usd'].quantile(PRICE_QUANTILE)
+    df = below_cutoffs(df, nat_99, lab_99)
+
+    print(f"After outlier removal: {len(df)} rows")
+
+    # ── 2. ENCODE CATEGORICAL VARIABLES ─────────────────────────────
+    # Cut: use existing cut_id (1=Good, 2=Very Good, 3=Excellent/Ideal)
+    # Check what values we have
+    print("\nCut distribution:")
+    print(df.groupby(['cut_id','cut_name']).size())
+
+    print("\nColor distribution:")
+    print(df.groupby(['color_id','color_name']).size())
+
+    print("\nClarity distribution:")
+    print(df.groupby(['clarity_id','clarity_name']).size())
+
+    print("\nCert distribution:")
+    print(df['lab_cert'].value_counts())
+
+    print("\nFluorescence distribution:")
+    print(df['fluorescence'].value_counts())
+
+    # ── 3-5. LOG VARIABLES, ORIGIN AND CERT DUMMIES ─────────────────
+    df = derive(df)
+
+    # ── 6. SUMMARY STATS ─────────────────────────────────────────────
+    print("\n── CLEAN DATASET SUMMARY ──")
+    print(f"Total diamonds: {len(df)}")
+    print(f"Natural: {len(df[df['is_lab']==False])} | Lab: {len(df[df['is_lab']==True])}")
+    print(f"\nPrice (USD):")
+    print(df.groupby('is_lab')['price_usd'].describe().round(0))
+    print(f"\nCarat:")
+    print(df.groupby('is_lab')['carat'].describe().round(3))
+
+    # ── 7. PLOT PRICE DISTRIBUTIONS ──────────────────────────────────
+    if plots:
+        plot_distributions(df)
+
+    # ── 8. SAVE CLEAN DATASET ────────────────────────────────────────
+    path = dataset.save(df, "diamonds_clean")
+    print(f"\nClean dataset saved: {len(df)} rows → {path}")
+
+
+def sketch_cutoffs(chunk_size, compression):
+    # Pass 1: per-origin price digests over the in-range rows
+    digests = {False: TDigest(compression), True: TDigest(compression)}
+    raw = 0
+    for chunk in dataset.iter_chunks("diamonds_raw", columns=["price_usd", "is_lab", "carat"], chunksize=chunk_size):
+        raw += len(chunk)
+        chunk = in_range(chunk)
+        for is_lab, digest in digests.items():
+            digest.update(chunk.loc[chunk['is_lab'] == is_lab, 'price_usd'].to_numpy())
+    return raw, digests
+
+def check_cutoffs(digests):
+    # Sketch vs exact quantiles (needs the price column in memory, so only a check)
+    df = in_range(dataset.load("diamonds_raw", columns=["price_usd", "is_lab", "carat"]))
+    print("\n── SKETCH vs EXACT ──")
+    for is_lab, digest in digests.items():
+        prices = df.loc[df['is_lab'] == is_lab, 'price_usd']
+        exact = prices.quantile(PRICE_QUANTILE)
+        sketched = float(digest.quantile(PRICE_QUANTILE))
+        rank = (prices <= sketched).mean()
+        flipped = int(prices.between(min(exact, sketched), max(exact, sketched), inclusive="right").sum())
+        print(f"{'Lab' if is_lab else 'Natural'}: exact ${exact:,.2f}, sketch ${sketched:,.2f} "
+              f"({abs(sketched - exact) / exact:.3%} off), rank error {abs(rank - PRICE_QUANTILE):.5f} "
+              f"(bound {digest.rank_error_bound(PRICE_QUANTILE):.5f}), {flipped} rows filtered differently")
+
+def clean_chunked(chunk_size=100000, compression=500, check=False):
+    raw, digests = sketch_cutoffs(chunk_size, compression)
+    nat_cut = float(digests[False].quantile(PRICE_QUANTILE))
+    lab_cut = float(digests[True].quantile(PRICE_QUANTILE))
+    print(f"Raw dataset: {raw} rows, {len(digests[False]) + len(digests[True])} in range")
+    print(f"Sketched {PRICE_QUANTILE:.0%} price cut-offs: natural ${nat_cut:,.0f}, lab ${lab_cut:,.0f} "
+          f"({digests[False].centroids()} + {digests[True].centroids()} centroids)")
+    if check:
+        check_cutoffs(digests)
+
+    # Pass 2: filter, derive and append chunk by chunk
+    totals = {}
+    with dataset.Writer("diamonds_clean") as writer:
+        for chunk in dataset.iter_chunks("diamonds_raw", chunksize=chunk_size):
+            chunk = derive(below_cutoffs(in_range(chunk), nat_cut, lab_cut))
+            writer.write(chunk)
+            stats = chunk.groupby('is_lab')['price_usd'].agg(['count', 'sum', 'min', 'max'])
+            for is_lab, row in stats.iterrows():
+                total = totals.setdefault(is_lab, {'count': 0, 'sum': 0, 'min': np.inf, 'max': -np.inf})
+                total['count'] += row['count']
+                total['sum'] += row['sum']
+                total['min'] = min(total['min'], row['min'])
+                total['max'] = max(total['max'], row['max'])
+
+    print("\n── CLEAN DATASET SUMMARY ──")
+    print(f"Total diamonds: {writer.count}")
+    for is_lab, total in sorted(totals.items()):
+        print(f"{'Lab' if is_lab else 'Natural'}: {total['count']:.0f} stones, price mean ${total['sum'] / total['count']:,.0f}, "
+              f"range ${total['min']:,.0f}-${total['max']:,.0f}")
+    print(f"\nClean dataset saved: {writer.count} rows → {writer.path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter outliers and derive regression columns for diamonds_raw")
+    parser.add_argument("--chunked", action="store_true",
+                        help="stream the raw data in chunks with sketched price cut-offs (no plots)")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--compression", type=int, default=500, help="t-digest compression (accuracy vs size)")
+    parser.add_argument("--check", action="store_true", help="with --chunked: compare sketched cut-offs to exact ones")
+    parser.add_argument("--no-plots", action="store_true", help="skip price_distributions.png (matplotlib is never imported)")
+    args = parser.parse_args()
+
+    if args.chunked:
+        clean_chunked(args.chunk_size, args.compression, args.check)
+    else:
+        clean_in_memory(plots=not args.no_plots)
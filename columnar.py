@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from scraper import DIAMOND_SCHEMA, extract_items
+from sink import PANDAS_TYPES
+
+# Columnar parser for searchByIDs pages. Rather than building one dict per
+# stone with chained .get calls and letting pandas infer types from a list of
+# dicts, pages are gathered column by column (one comprehension per field)
+# into a ColumnBuffer, and each batch is converted once, straight to its
+# DIAMOND_SCHEMA types: grade ids as nullable int8, names as categoricals,
+# flags as booleans. Converting per batch rather than per 50-item page keeps
+# pandas' fixed per-call overhead out of the hot loop.
+
+# (column, path into the item) for every field QUERY selects
+FIELDS = [
+    ("productID", ("productID",)),
+    ("price_usd", ("price",)),
+    ("is_lab", ("stone", "isLabDiamond")),
+    ("carat", ("stone", "carat")),
+    ("depth_pct", ("stone", "depth")),
+    ("table_pct", ("stone", "tableSize")),
+    ("color_id", ("stone", "color", "id")),
+    ("color_name", ("stone", "color", "name")),
+    ("cut_id", ("stone", "cut", "id")),
+    ("cut_name", ("stone", "cut", "name")),
+    ("clarity_id", ("stone", "clarity", "id")),
+    ("clarity_name", ("stone", "clarity", "name")),
+    ("lab_cert", ("stone", "lab", "name")),
+    ("fluorescence", ("stone", "flour", "name")),
+    ("symmetry", ("stone", "symmetry", "name")),
+    ("polish", ("stone", "polish", "name")),
+    ("shape", ("stone", "shape", "name")),
+]
+
+EMPTY = {}
+
+def to_column(values, kind):
+    if kind == "category":
+        return pd.Categorical(values)
+    if kind == "string":
+        return pd.array(values, dtype="string")
+    # NumPy turns None into NaN on float conversion, which doubles as the null mask
+    floats = np.array(values, dtype=np.float64)
+    if kind in ("float32", "float64"):
+        return floats.astype(kind, copy=False)
+    missing = np.isnan(floats)
+    filled = np.where(missing, 0, floats)
+    if kind == "bool":
+        return pd.arrays.BooleanArray(filled.astype(bool), missing)
+    return pd.arrays.IntegerArray(filled.astype(kind), missing)
+
+class ColumnBuffer:
+    def __init__(self, schema=DIAMOND_SCHEMA):
+        self.schema = schema
+        self.columns = {column: [] for column, path in FIELDS}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def extend(self, raw_items):
+        # Same rows as scraper.parse_items (items without a stone are skipped)
+        items = [item for item in extract_items(raw_items) if isinstance(item, dict) and item.get("stone")]
+        stones = [item["stone"] for item in items]
+        for column, path in FIELDS:
+            if len(path) == 1:
+                values = [item.get(path[0]) for item in items]
+            elif len(path) == 2:
+                values = [stone.get(path[1]) for stone in stones]
+            else:
+                values = [(stone.get(path[1]) or EMPTY).get(path[2]) for stone in stones]
+            self.columns[column].extend(values)
+        self.rows += len(items)
+        return len(items)
+
+    def to_frame(self):
+        df = pd.DataFrame({column: to_column(values, self.schema[column])
+                           for column, values in self.columns.items()})
+        self.columns = {column: [] for column in self.columns}
+        self.rows = 0
+        return df
+
+def parse_columns(raw_items, schema=DIAMOND_SCHEMA):
+    buffer = ColumnBuffer(schema)
+    buffer.extend(raw_items)
+    return buffer.to_frame()
+
+class PageWriter:
+    # Batches raw pages into typed frames before they reach a RecordSink
+    def __init__(self, sink, batch_size=None):
+        self.sink = sink
+        self.buffer = ColumnBuffer()
+        self.batch_size = batch_size or sink.batch_size
+
+    def write(self, raw_items):
+        n = self.buffer.extend(raw_items)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return n
+
+    def flush(self):
+        if len(self.buffer):
+            self.sink.write_frame(self.buffer.to_frame())
+
+def coerce_frame(df, schema=DIAMOND_SCHEMA):
+    # Cast an already-built frame (e.g. a store export) to the schema types
+    return df[list(schema)].astype({column: PANDAS_TYPES[kind] for column, kind in schema.items()})
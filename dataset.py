@@ -0,0 +1,224 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from sink import PANDAS_TYPES, frame_to_table
+from scraper import DIAMOND_SCHEMA
+from reddit_scraper import POST_SCHEMA
+
+# Typed hand-off format between pipeline stages. Every table has an explicit
+# schema (type names from sink.ARROW_TYPES) and is stored as zstd-compressed
+# Parquet next to the CSV it replaces, so readers get bool / int8 /
+# categorical columns without re-parsing text and can load just the columns
+# they use. load() falls back to the CSV when there is no Parquet copy, or
+# when the CSV is newer, so the committed CSV snapshots still work.
+#
+#   python dataset.py import                  # CSV -> Parquet for every table
+#   python dataset.py export diamonds_clean   # Parquet -> CSV
+#   python dataset.py audit diamonds_clean    # memory: plain read_csv vs load(compact=True)
+
+# Post text lives in textstore.py's blob; tables after reddit_raw keep only this
+TEXT_COLUMNS = ["title", "text"]
+POST_META_SCHEMA = {name: kind for name, kind in POST_SCHEMA.items() if name not in TEXT_COLUMNS}
+
+# dedup.py: one canonical post per near-duplicate cluster
+DEDUP_SCHEMA = {**POST_META_SCHEMA, "cluster_size": "int32"}
+
+SENTIMENT_SCHEMA = {
+    **DEDUP_SCHEMA,
+    "compound": "float64",
+    "positive": "float64",
+    "negative": "float64",
+    "neutral": "float64",
+    "topic": "category",
+}
+
+N_TOPICS = 8
+
+CLEAN_SCHEMA = {
+    **DIAMOND_SCHEMA,
+    "ln_price": "float64",
+    "ln_carat": "float64",
+    "origin_natural": "int8",
+    "cert_GIA": "int8",
+}
+
+DATASETS = {
+    "diamonds_raw": DIAMOND_SCHEMA,
+    "diamonds_clean": CLEAN_SCHEMA,
+    # kaggle_ingest.py: archive.zip mapped onto the clean columns
+    "diamonds_kaggle": {**CLEAN_SCHEMA, "source": "category"},
+    "reddit_raw": POST_SCHEMA,
+    "reddit_dedup": DEDUP_SCHEMA,
+    "reddit_sentiment": SENTIMENT_SCHEMA,
+    "reddit_topics": {
+        **SENTIMENT_SCHEMA,
+        "dominant_topic": "int8",
+        **{f"topic_{i}_prop": "float64" for i in range(N_TOPICS)},
+    },
+}
+
+def text_columns(schema, columns=None):
+    # read_csv dtypes that keep ids like 2ra2mu or 007 as text
+    return {name: str for name, kind in schema.items()
+            if kind in ("string", "category") and (columns is None or name in columns)}
+
+def coerce(df, schema):
+    columns = {}
+    for name, kind in schema.items():
+        values = df[name]
+        if kind == "string" and pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime("%Y-%m-%d")
+        columns[name] = values.astype(PANDAS_TYPES[kind])
+    return pd.DataFrame(columns)
+
+def to_table(df, schema):
+    return frame_to_table(coerce(df, schema), schema)
+
+def read_file(path, schema, columns=None):
+    # Either format, returned with the same (NumPy-backed where possible) dtypes
+    if path.endswith(".parquet"):
+        return pq.read_table(path, columns=columns).to_pandas()
+    schema = {name: kind for name, kind in schema.items() if columns is None or name in columns}
+    df = pd.read_csv(path, usecols=columns, dtype=text_columns(schema))
+    return to_table(df, schema).to_pandas()
+
+def source(name):
+    parquet, csv = name + ".parquet", name + ".csv"
+    if os.path.exists(parquet) and not (os.path.exists(csv) and os.path.getmtime(csv) > os.path.getmtime(parquet)):
+        return parquet
+    if os.path.exists(csv):
+        return csv
+    raise FileNotFoundError(f"no {parquet} or {csv} - run the stage that produces {name} first")
+
+def float32_safe(values, max_decimals=4):
+    # True when the values have at most max_decimals decimal places and
+    # survive a float32 round trip at that precision (carat, depth_pct, ...)
+    values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[~np.isnan(values)]
+    for decimals in range(max_decimals + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            return np.array_equal(np.round(values.astype(np.float32).astype(np.float64), decimals), values)
+    return False
+
+def compact_frame(df):
+    # Smallest dtypes that hold the data exactly: bool flags as bool, integers
+    # downcast (grade ids to int8), measurements with a few decimals as
+    # float32, and low-cardinality text as categoricals. Derived floats such as
+    # ln_price stay float64. For holding large inventories in memory; values
+    # come back in the original dtypes with .astype(), not bit-identical maths.
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.cat.remove_unused_categories()
+        elif values.dtype == "boolean" and not values.hasnans:
+            values = values.astype(bool)
+        elif pd.api.types.is_integer_dtype(values) and not values.hasnans:
+            values = pd.to_numeric(values.astype(np.int64), downcast="integer")
+        elif pd.api.types.is_float_dtype(values) and values.dtype != np.float32 and float32_safe(values):
+            values = values.astype(np.float32)
+        elif pd.api.types.is_string_dtype(values) and not pd.api.types.is_bool_dtype(values) \
+                and values.nunique() <= len(values) // 2:
+            values = values.astype("category")
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def load(name, columns=None, compact=False):
+    df = read_file(source(name), DATASETS[name], columns)
+    return compact_frame(df) if compact else df
+
+def iter_chunks(name, columns=None, chunksize=100000):
+    # load() a batch of rows at a time, with the same dtypes
+    path = source(name)
+    schema = DATASETS[name]
+    if path.endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    schema = {column: kind for column, kind in schema.items() if columns is None or column in columns}
+    for chunk in pd.read_csv(path, usecols=columns, dtype=text_columns(schema), chunksize=chunksize):
+        yield to_table(chunk, schema).to_pandas()
+
+class Writer:
+    # save() for data that arrives in chunks; the file appears on close()
+    def __init__(self, name):
+        self.schema = DATASETS[name]
+        self.path = name + ".parquet"
+        self.writer = None
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.writer is not None:
+            self.writer.close()
+            os.remove(self.path + ".tmp")
+
+    def write(self, df):
+        table = to_table(df, self.schema)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path + ".tmp", table.schema, compression="zstd")
+        self.writer.write_table(table)
+        self.count += len(df)
+
+    def close(self):
+        if self.writer is None:
+            self.write(pd.DataFrame({column: pd.Series(dtype=PANDAS_TYPES[kind]) for column, kind in self.schema.items()}))
+        self.writer.close()
+        os.replace(self.path + ".tmp", self.path)
+        return self.path
+
+def save(df, name):
+    # Columns outside the schema (scratch text, periods) are not handed on
+    path = name + ".parquet"
+    pq.write_table(to_table(df, DATASETS[name]), path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    return path
+
+def import_csv(name):
+    csv = name + ".csv"
+    df = pd.read_csv(csv, dtype=text_columns(DATASETS[name]))
+    path = save(df, name)
+    print(f"{csv} ({os.path.getsize(csv) / 1e6:.1f} MB) -> {path} ({os.path.getsize(path) / 1e6:.1f} MB), {len(df)} rows")
+
+def export_csv(name):
+    df = load(name)
+    df.to_csv(name + ".csv", index=False)
+    print(f"{name}.csv written, {len(df)} rows")
+
+def memory_audit(name):
+    # Per-column bytes of a plain pd.read_csv of the CSV against the same file
+    # read typed and compacted (what load(compact=True) returns)
+    before = pd.read_csv(name + ".csv")
+    after = compact_frame(read_file(name + ".csv", DATASETS[name]))
+    old, new = before.memory_usage(deep=True, index=False), after.memory_usage(deep=True, index=False)
+    print(f"\n── {name}: {len(before)} rows ──")
+    print(f"{'column':<18} {'read_csv':>10} {'bytes':>11}  {'compact':>10} {'bytes':>11} {'ratio':>7}")
+    for column in before.columns:
+        print(f"{column:<18} {str(before[column].dtype):>10} {old[column]:>11,}  "
+              f"{str(after[column].dtype):>10} {new[column]:>11,} {old[column] / new[column]:>6.1f}x")
+    print(f"{'total':<18} {'':>10} {old.sum():>11,}  {'':>10} {new.sum():>11,} {old.sum() / new.sum():>6.1f}x")
+    print(f"{old.sum() / len(before):.0f} -> {new.sum() / len(after):.0f} bytes/row: "
+          f"{1e9 / new.sum() * len(after) / 1e6:.1f}M rows per GB (was {1e9 / old.sum() * len(before) / 1e6:.1f}M)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pipeline tables between CSV and typed Parquet")
+    parser.add_argument("command", choices=["import", "export", "audit"])
+    parser.add_argument("names", nargs="*", help="tables (default: every table with a source file): " + ", ".join(DATASETS))
+    args = parser.parse_args()
+
+    ext = ".parquet" if args.command == "export" else ".csv"
+    names = args.names or [name for name in DATASETS if os.path.exists(name + ext)]
+    for name in names:
+        if args.command == "import":
+            import_csv(name)
+        elif args.command == "export":
+            export_csv(name)
+        else:
+            memory_audit(name)
@@ -0,0 +1,123 @@
+import argparse
+import re
+import time
+import zlib
+import numpy as np
+
+import dataset
+from session import Session
+
+# Near-duplicate Reddit posts (cross-posts, reposts, templated questions)
+# collapsed before sentiment and topic modelling. Each post's title + text
+# is cut into word shingles, hashed to a MinHash signature, and the
+# signatures are split into LSH bands: posts sharing any band become
+# candidates, so the work grows with the corpus instead of with its square.
+# Candidates whose signatures agree on at least --threshold of their
+# positions (an estimate of shingle Jaccard similarity) are joined into
+# clusters. The earliest post of each cluster is kept, with cluster_size
+# recording how many posts it stands for, in reddit_dedup.parquet. Text
+# comes from the memory-mapped store (textstore.py), not the table.
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 16
+THRESHOLD = 0.8
+SEED = 42
+
+def shingle_hashes(text, k=SHINGLE_WORDS):
+    # crc32 of each k-word window of the normalised text (posts shorter than
+    # k words get one shingle)
+    words = re.findall(r"[a-z0-9']+", str(text).lower())
+    windows = [" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))]
+    return [zlib.crc32(window.encode("utf-8")) for window in windows]
+
+def minhash(texts, num_perm=NUM_PERM, seed=SEED, block=16):
+    # -> (len(texts), num_perm) uint64 signatures. Hash family: multiply-shift,
+    # h(x) = (a*x + b) >> 32 with odd 64-bit a, wrapping in uint64
+    shingles = [np.unique(np.array(shingle_hashes(text), dtype=np.uint64)) for text in texts]
+    offsets = np.cumsum([0] + [len(s) for s in shingles[:-1]])
+    values = np.concatenate(shingles)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for start in range(0, num_perm, block):
+        hashed = (a[start:start + block, None] * values[None, :] + b[start:start + block, None]) >> np.uint64(32)
+        signatures[:, start:start + block] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return signatures
+
+def candidate_pairs(signatures, bands=BANDS):
+    # Pairs of rows whose signatures are identical on at least one band
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        _, bucket, counts = np.unique(keys.view(np.dtype((np.void, keys.dtype.itemsize * rows))).ravel(),
+                                      return_inverse=True, return_counts=True)
+        shared = counts[bucket] > 1
+        members = np.flatnonzero(shared)
+        order = members[np.argsort(bucket[members], kind="stable")]
+        bounds = np.flatnonzero(np.diff(bucket[order])) + 1
+        for group in np.split(order, bounds):
+            group = group.tolist()
+            pairs.update((i, j) for n, i in enumerate(group) for j in group[n + 1:])
+    return pairs
+
+def clusters(signatures, pairs, threshold=THRESHOLD):
+    # Union-find over the candidate pairs that pass the similarity check
+    parent = list(range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        if np.mean(signatures[i] == signatures[j]) >= threshold:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([find(i) for i in range(len(signatures))])
+
+def dedup(df, store, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    # -> (canonical posts with cluster_size, cluster label per input row)
+    df = df.sort_values(['created_utc', 'id'], kind='stable').reset_index(drop=True)
+    signatures = minhash(store.full_text(df['id']), num_perm)
+    labels = clusters(signatures, candidate_pairs(signatures, bands), threshold)
+    # Rows are in time order, so each cluster's root is its earliest post
+    sizes = np.bincount(labels, minlength=len(df))
+    keep = labels == np.arange(len(df))
+    canonical = df[keep].copy()
+    canonical['cluster_size'] = sizes[keep]
+    return canonical, df.assign(cluster=labels)
+
+def main(plots=True, session=None, threshold=THRESHOLD, examples=5):
+    # plots: accepted for session.run(); there is no figure
+    session = session or Session()
+    df = session.load('reddit_raw', columns=list(dataset.POST_META_SCHEMA))
+    store = session.text()
+    start = time.perf_counter()
+    canonical, _ = dedup(df, store, threshold)
+    seconds = time.perf_counter() - start
+
+    dropped = len(df) - len(canonical)
+    print(f"{len(df)} posts -> {len(canonical)} after near-duplicate removal "
+          f"({dropped} dropped, {dropped / len(df):.1%}) in {seconds:.2f}s")
+    sizes = canonical['cluster_size'].value_counts().sort_index()
+    print("Cluster sizes:", ", ".join(f"{size}: {count}" for size, count in sizes.items()))
+    largest = canonical.nlargest(examples, 'cluster_size')
+    for size, title in zip(largest['cluster_size'], store.titles(largest['id'])):
+        if size > 1:
+            print(f"  {size:3d} x  {title[:70]}")
+
+    path = session.save(canonical, 'reddit_dedup')
+    print(f"Saved to {path}")
+    return canonical
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collapse near-duplicate Reddit posts with MinHash LSH")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="estimated Jaccard similarity of word shingles that counts as a duplicate")
+    args = parser.parse_args()
+    main(threshold=args.threshold)
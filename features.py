@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+import dataset
+
+# One design matrix for every price regression. The encodings below used to
+# be copied into regression.py, regression_v2.py and figures.py (and had
+# drifted: figures.py had no 'VSB' fluorescence grade). build() makes the
+# whole matrix in one vectorised pass as a C-contiguous float64 array, and
+# load() memoises it under .feature_cache/, keyed by a hash of the clean
+# dataset file plus SPEC, so every script fits on identical features.
+
+SPEC = {
+    # Cut: True Hearts and Ideal both top tier, merge them; 5=Fair (Kaggle only)
+    "cut_map": {0: 4, 1: 4, 2: 3, 3: 2, 4: 1, 5: 0},
+    "cut_default": 2,
+    # Fluorescence: None=0, Faint=1, Medium=2, Strong=3, Very Strong=4
+    "fluor_map": {"NN": 0, "NEG": 0, "F": 1, "SLT": 1, "M": 2, "S": 3, "SB": 4, "VSB": 4},
+    "fluor_default": 0,
+    # Carat bunching dummies around psychological price points
+    "bunching": [0.5, 0.7, 0.9, 1.0, 1.5, 2.0, 3.0],
+    "bunching_window": 0.05,
+}
+
+# Bump when build() changes in a way SPEC doesn't capture
+VERSION = 1
+CACHE_DIR = ".feature_cache"
+SOURCE_COLUMNS = ["price_usd", "is_lab", "carat", "cut_id", "color_id", "clarity_id", "lab_cert", "fluorescence"]
+
+def bunching_column(threshold):
+    return f'near_{str(threshold).replace(".", "p")}'
+
+def feature_columns(spec=SPEC):
+    return (["const", "ln_carat", "cut_encoded", "color_id", "clarity_id", "fluor_encoded", "cert_GIA",
+             "origin_natural", "origin_x_ln_carat", "origin_x_clarity"]
+            + [bunching_column(t) for t in spec["bunching"]])
+
+BUNCHING_COLUMNS = [bunching_column(t) for t in SPEC["bunching"]]
+
+# Regressors of models 1-4 (const is added by the fitting code). Model 1 is
+# fitted on natural stones only; model 4 is model 3 plus the bunching dummies.
+MODEL1_COLUMNS = ["ln_carat", "cut_encoded", "color_id", "clarity_id", "fluor_encoded", "cert_GIA"]
+MODEL2_COLUMNS = MODEL1_COLUMNS + ["origin_natural"]
+MODEL3_COLUMNS = MODEL2_COLUMNS + ["origin_x_ln_carat", "origin_x_clarity"]
+MODEL4_COLUMNS = MODEL3_COLUMNS + BUNCHING_COLUMNS
+
+def lookup(values, mapping, default):
+    # Map each distinct value once, then gather by code (NaN -> default)
+    codes, uniques = pd.factorize(values)
+    table = np.array([mapping.get(value, default) for value in uniques] + [default], dtype=np.float64)
+    return table[codes]
+
+class FeatureMatrix:
+    def __init__(self, values, columns, target, extras):
+        self.values = values
+        self.columns = list(columns)
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.target = target
+        # Row-aligned raw columns for plots and subsets: is_lab, price_usd, carat
+        self.extras = extras
+
+    def __len__(self):
+        return len(self.values)
+
+    def rows(self, mask=None):
+        return slice(None) if mask is None else np.asarray(mask)
+
+    def design(self, columns, mask=None):
+        # Constant plus `columns`, as the DataFrame statsmodels names params from
+        names = ["const"] + [name for name in columns if name != "const"]
+        idx = [self.index[name] for name in names]
+        return pd.DataFrame(self.values[self.rows(mask)][:, idx], columns=names)
+
+    def y(self, mask=None):
+        return pd.Series(self.target[self.rows(mask)], name="ln_price")
+
+    def frame(self, mask=None):
+        rows = self.rows(mask)
+        df = pd.DataFrame(self.values[rows], columns=self.columns)
+        df["ln_price"] = self.target[rows]
+        for name, values in self.extras.items():
+            df[name] = values[rows]
+        return df
+
+def build(df, spec=SPEC):
+    columns = feature_columns(spec)
+    values = np.empty((len(df), len(columns)), dtype=np.float64)
+    col = {name: values[:, i] for i, name in enumerate(columns)}
+
+    carat = df["carat"].to_numpy(dtype=np.float64)
+    is_lab = df["is_lab"].to_numpy(dtype=bool)
+    col["const"][:] = 1.0
+    np.log(carat, out=col["ln_carat"])
+    col["cut_encoded"][:] = lookup(df["cut_id"], spec["cut_map"], spec["cut_default"])
+    col["color_id"][:] = df["color_id"].to_numpy(dtype=np.float64)
+    col["clarity_id"][:] = df["clarity_id"].to_numpy(dtype=np.float64)
+    col["fluor_encoded"][:] = lookup(df["fluorescence"], spec["fluor_map"], spec["fluor_default"])
+    col["cert_GIA"][:] = (df["lab_cert"] == "GIA").to_numpy(dtype=np.float64)
+    col["origin_natural"][:] = ~is_lab
+    np.multiply(col["origin_natural"], col["ln_carat"], out=col["origin_x_ln_carat"])
+    np.multiply(col["origin_natural"], col["clarity_id"], out=col["origin_x_clarity"])
+    window = spec["bunching_window"]
+    for threshold in spec["bunching"]:
+        col[bunching_column(threshold)][:] = (carat >= threshold - window) & (carat <= threshold + window)
+
+    price = df["price_usd"].to_numpy()
+    extras = {"is_lab": is_lab, "price_usd": price, "carat": carat}
+    return FeatureMatrix(values, columns, np.log(price.astype(np.float64)), extras)
+
+def cache_key(path, spec=SPEC):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps([VERSION, spec], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def load(spec=SPEC, cache_dir=CACHE_DIR, refresh=False):
+    path = dataset.source("diamonds_clean")
+    cached = os.path.join(cache_dir, cache_key(path, spec) + ".npz")
+    if os.path.exists(cached) and not refresh:
+        with np.load(cached) as f:
+            extras = {name[len("extra_"):]: f[name] for name in f.files if name.startswith("extra_")}
+            return FeatureMatrix(f["values"], f["columns"].tolist(), f["target"], extras)
+
+    fm = build(dataset.load("diamonds_clean", columns=SOURCE_COLUMNS), spec)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = cached[:-len(".npz")] + ".tmp.npz"
+    np.savez(tmp, values=fm.values, columns=np.array(fm.columns), target=fm.target,
+             **{"extra_" + name: values for name, values in fm.extras.items()})
+    os.replace(tmp, cached)
+    return fm
+
+if __name__ == "__main__":
+    fm = load(refresh=True)
+    print(f"{len(fm)} rows x {len(fm.columns)} features: {', '.join(fm.columns)}")
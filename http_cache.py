@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+# On-disk replay cache for scraper HTTP responses. Entries are addressed by a
+# SHA-256 of (method, URL, query params, JSON payload) and stored gzipped under
+# <root>/<2 hex>/<hash>.json.gz. Modes:
+#   record - serve hits from the cache, fetch and store misses
+#   replay - serve hits only; a miss raises CacheMiss (fully offline)
+#   bypass - ignore the cache entirely
+# Hits refresh the entry's mtime, and the oldest entries are evicted once the
+# cache grows past max_bytes.
+
+MODES = ("record", "replay", "bypass")
+
+class CacheMiss(Exception):
+    pass
+
+class CachedResponse:
+    # The subset of requests.Response the scrapers use
+    def __init__(self, status_code, content, url, from_cache):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+def request_key(method, url, params=None, json_body=None):
+    canonical = json.dumps([method.upper(), url, params or {}, json_body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, root=".http_cache", mode="record", max_bytes=1 << 30):
+        if mode not in MODES:
+            raise ValueError(f"cache mode must be one of {MODES}, got {mode!r}")
+        self.root = root
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = None
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json.gz")
+
+    def get(self, method, url, params=None, json_body=None):
+        if self.mode == "bypass":
+            return None
+        key = request_key(method, url, params, json_body)
+        path = self.path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                entry = json.loads(f.read())
+        except FileNotFoundError:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMiss(f"{method} {url} not in cache {self.root} (key {key[:12]})")
+            return None
+        os.utime(path)
+        self.hits += 1
+        return CachedResponse(entry["status"], entry["body"].encode("utf-8"), url, from_cache=True)
+
+    def put(self, method, url, status_code, content, params=None, json_body=None):
+        # Only successful responses are worth replaying
+        if self.mode != "record" or status_code != 200:
+            return
+        key = request_key(method, url, params, json_body)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"method": method.upper(), "url": url, "params": params, "json": json_body,
+                 "status": status_code, "fetched_at": time.time(),
+                 "body": content.decode("utf-8", errors="replace")}
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(json.dumps(entry).encode("utf-8"))
+        os.replace(tmp, path)
+
+        if self.size is None:
+            self.size = self.disk_usage()
+        else:
+            self.size += os.path.getsize(path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(dirpath, name)
+                    stat = os.stat(path)
+                    yield stat.st_mtime, stat.st_size, path
+
+    def disk_usage(self):
+        return sum(size for mtime, size, path in self.entries())
+
+    def evict(self, target=None):
+        # Drop least recently used entries until the cache is under target
+        # (90% of max_bytes by default, so eviction doesn't run on every put)
+        target = int(self.max_bytes * 0.9) if target is None else target
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in entries:
+            if size <= target:
+                break
+            os.remove(path)
+            size -= entry_size
+        self.size = size
+
+    def stats(self):
+        return f"cache {self.mode}: {self.hits} hits, {self.misses} misses"
+
+def add_arguments(parser):
+    parser.add_argument("--cache", choices=MODES, help="replay cache mode for HTTP responses (see http_cache.py)")
+    parser.add_argument("--cache-dir", default=".http_cache")
+    parser.add_argument("--cache-max-mb", type=int, default=1024)
+
+def from_args(args):
+    if not args.cache:
+        return None
+    return ResponseCache(args.cache_dir, args.cache, args.cache_max_mb << 20)
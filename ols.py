@@ -0,0 +1,116 @@
+import math
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# Lean least squares for the hedonic models: coefficients, HC3 standard
+# errors, normal p-values and confidence intervals (what statsmodels'
+# fit(cov_type="HC3") reports), R-squared and residuals, without building a
+# statsmodels results object.
+#
+# Nested specifications share one thin QR factorisation X = QR: ordering
+# the columns so each smaller model is a prefix of the next, the model on
+# the first k columns is Q[:, :k], R[:k, :k]. Its HC3 leverages are row sums
+# of Q[:, :k]**2 (accumulated as k grows, never the n x n hat matrix), and
+#   cov = R^-1 (Q' diag(e^2 / (1 - h)^2) Q) R^-T
+# Assumes full column rank, as the hedonic designs are. Estimates is the
+# results record without the rows, for fits made from moments (suffstats.py).
+
+class Estimates:
+    # The parts of a statsmodels RegressionResults the scripts read, from the
+    # coefficients, their covariance and the sums of squares
+    def __init__(self, columns, params, cov, nobs, ssr, tss, cov_type="HC3", df_resid=None):
+        self.columns = list(columns)
+        self.cov_type = cov_type
+        self.nobs = float(nobs)
+        self.df_model = len(self.columns) - 1
+        # Absorbed fixed effects use up degrees of freedom the columns don't show
+        self.df_resid = self.nobs - len(self.columns) if df_resid is None else float(df_resid)
+        self.params = pd.Series(params, index=self.columns)
+        self.cov = cov
+        self.bse = pd.Series(np.sqrt(np.diag(cov)), index=self.columns)
+        self.tvalues = self.params / self.bse
+        self.pvalues = self.tvalues.abs().map(lambda z: math.erfc(z / math.sqrt(2)))
+        self.ssr = float(ssr)
+        self.rsquared = 1 - self.ssr / tss
+        self.rsquared_adj = 1 - (self.nobs - 1) / self.df_resid * (1 - self.rsquared)
+
+    def cov_params(self):
+        return pd.DataFrame(self.cov, index=self.columns, columns=self.columns)
+
+    def conf_int(self, alpha=0.05):
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        return pd.DataFrame({0: self.params - z * self.bse, 1: self.params + z * self.bse})
+
+    def summary(self):
+        z = NormalDist().inv_cdf(0.975)
+        lines = [f"OLS, {self.cov_type} standard errors   n = {self.nobs:.0f}   R-squared = {self.rsquared:.4f}   "
+                 f"adj. R-squared = {self.rsquared_adj:.4f}",
+                 f"{'':<20} {'coef':>10} {'std err':>10} {'z':>9} {'P>|z|':>8} {'[0.025':>10} {'0.975]':>10}"]
+        for name in self.columns:
+            coef, se = self.params[name], self.bse[name]
+            lines.append(f"{name:<20} {coef:10.4f} {se:10.4f} {self.tvalues[name]:9.3f} "
+                         f"{self.pvalues[name]:8.3f} {coef - z * se:10.4f} {coef + z * se:10.4f}")
+        return "\n".join(lines)
+
+class Fit(Estimates):
+    # Estimates plus the residuals and fitted values of an HC3 fit on rows
+    def __init__(self, columns, params, cov, y, fitted):
+        resid = y - fitted
+        super().__init__(columns, params, cov, len(y), resid @ resid, ((y - y.mean()) ** 2).sum())
+        self.fittedvalues = fitted
+        self.resid = resid
+
+    def reordered(self, columns):
+        idx = [self.columns.index(name) for name in columns]
+        return Fit(columns, self.params.to_numpy()[idx], self.cov[np.ix_(idx, idx)],
+                   self.resid + self.fittedvalues, self.fittedvalues)
+
+def fit_nested(X, y, columns, sizes):
+    # One QR of X; returns a Fit on the first k columns for each k in sizes
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    Q, R = np.linalg.qr(X)
+    qty = Q.T @ y
+    leverage = np.zeros(len(y))
+    fitted = np.zeros(len(y))
+    done = 0
+    fits = {}
+    for k in sorted(set(sizes)):
+        block = Q[:, done:k]
+        leverage += np.einsum("ij,ij->i", block, block)
+        fitted += block @ qty[done:k]
+        done = k
+        resid = y - fitted
+        Qk = Q[:, :k]
+        weights = (resid / (1 - leverage)) ** 2
+        meat = Qk.T @ (Qk * weights[:, None])
+        R_inv = np.linalg.solve(R[:k, :k], np.eye(k))
+        fits[k] = Fit(columns[:k], R_inv @ qty[:k], R_inv @ meat @ R_inv.T, y, fitted.copy())
+    return [fits[k] for k in sizes]
+
+def nested_order(specs):
+    # Column order in which every spec is a prefix, or None if they don't nest
+    order = []
+    for spec in sorted(specs, key=len):
+        if not set(order) <= set(spec):
+            return None
+        order += [name for name in spec if name not in order]
+    return order
+
+def fit_many(fm, specs, mask=None):
+    # HC3 fits of ln_price on const + each spec (features.FeatureMatrix);
+    # nested specs share one factorisation, others get one each
+    specs = [["const"] + [name for name in spec if name != "const"] for spec in specs]
+    rows = fm.rows(mask)
+    y = fm.target[rows]
+    order = nested_order(specs)
+    if order is None:
+        return [fit_many(fm, [spec], mask)[0] for spec in specs]
+    X = fm.values[rows][:, [fm.index[name] for name in order]]
+    fits = fit_nested(X, y, order, [len(spec) for spec in specs])
+    # Each fit in its spec's own column order
+    return [fit if fit.columns == spec else fit.reordered(spec) for fit, spec in zip(fits, specs)]
+
+def fit(fm, columns, mask=None):
+    return fit_many(fm, [columns], mask)[0]
@@ -0,0 +1,235 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import dataset
+
+# Runs the research pipeline as a DAG of scripts. Each stage declares the
+# datasets (or raw files) it reads and the files it writes; stages are linked wherever one
+# stage's output is another's input. A stage is skipped when the content hash
+# of its inputs and code (the script plus every local module it imports,
+# transitively) matches the last successful run and its outputs still exist,
+# so a rerun that rewrites identical bytes also spares everything downstream.
+# Ready stages run as parallel subprocesses, so the diamond and Reddit
+# branches overlap. Scrapes hit live sites and only run when named.
+# --no-plots is the batch mode: figures are dropped from the outputs, their
+# scripts run with --no-plots, and figure-only stages are skipped.
+#
+#   python pipeline.py                  # rebuild whatever is stale
+#   python pipeline.py figures --force  # figures and everything upstream of it
+#   python pipeline.py scrape_reddit sentiment topic_model topic_timeseries
+#   python pipeline.py --no-plots       # data products only
+
+STATE_DIR = ".pipeline"
+
+Stage = namedtuple("Stage", ["name", "script", "inputs", "outputs", "manual", "args"], defaults=[False, ()])
+FIGURE_EXTENSIONS = (".png",)
+
+TEXT_STORE = ["reddit_text.bin", "reddit_text.index.parquet"]
+
+STAGES = [
+    Stage("scrape_diamonds", "scraper.py", [], ["diamonds_raw.parquet"], manual=True),
+    Stage("clean", "clean.py", ["diamonds_raw"], ["diamonds_clean.parquet", "price_distributions.png"]),
+    Stage("ingest_kaggle", "kaggle_ingest.py", ["archive.zip"], ["diamonds_kaggle.parquet"]),
+    Stage("regression", "regression.py", ["diamonds_clean"], ["regression_results.csv", "regression_diagnostics.png"]),
+    Stage("regression_v2", "regression_v2.py", ["diamonds_clean"], ["regression_v2_diagnostics.png"]),
+    Stage("figures", "figures.py", ["diamonds_clean"], ["figure1_premium_analysis.png"]),
+    Stage("premium_bands", "premium.py", ["diamonds_clean"], ["premium_bands.csv"]),
+    Stage("spec_search", "spec_search.py", ["diamonds_clean"], ["spec_curve.csv"]),
+    Stage("fixed_effects", "fixed_effects.py", ["diamonds_clean"], ["fe_results.csv"]),
+    Stage("scrape_reddit", "reddit_scraper.py", [], ["reddit_raw.parquet"], manual=True),
+    Stage("text_store", "textstore.py", ["reddit_raw"], TEXT_STORE),
+    Stage("dedup_reddit", "dedup.py", ["reddit_raw"] + TEXT_STORE, ["reddit_dedup.parquet"]),
+    Stage("sentiment", "sentiment.py", ["reddit_dedup"] + TEXT_STORE, ["reddit_sentiment.parquet", "figure2_sentiment.png"]),
+    Stage("topic_model", "topic_model.py", ["reddit_sentiment"] + TEXT_STORE, ["reddit_topics.parquet"]),
+    Stage("topic_timeseries", "topic_timeseries.py", ["reddit_topics"], ["figure3_topics.png"]),
+]
+
+def input_path(name):
+    # Dataset names resolve to their current file; names with an extension are plain files
+    return name if os.path.splitext(name)[1] else dataset.source(name)
+
+def without_figures(stages):
+    kept = []
+    for stage in stages:
+        outputs = [path for path in stage.outputs if not path.endswith(FIGURE_EXTENSIONS)]
+        if outputs == stage.outputs:
+            kept.append(stage)
+        elif outputs:
+            kept.append(stage._replace(outputs=outputs, args=stage.args + ("--no-plots",)))
+    return kept
+
+def upstream(stage, stages):
+    # Stages producing one of this stage's input datasets or files
+    wanted = {name if os.path.splitext(name)[1] else name + ".parquet" for name in stage.inputs}
+    return [other.name for other in stages if wanted & set(other.outputs)]
+
+def local_modules(script, seen=None):
+    # The script and every module in this directory it imports, transitively
+    seen = set() if seen is None else seen
+    if script in seen or not os.path.exists(script):
+        return seen
+    seen.add(script)
+    with open(script) as f:
+        tree = ast.parse(f.read(), script)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_modules(name.split(".")[0] + ".py", seen)
+    return seen
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint(stage):
+    # -> (hash, {path: hash}) over the stage's code and input files
+    files = sorted(local_modules(stage.script)) + sorted(input_path(name) for name in stage.inputs)
+    hashes = {path: file_hash(path) for path in files}
+    digest = hashlib.sha256(json.dumps([stage.outputs, hashes], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest(), hashes
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save_state(state, path):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def run_stage(stage, log_path):
+    # MPLBACKEND=Agg: the scripts call plt.show(), which must not block here
+    env = dict(os.environ, MPLBACKEND="Agg")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        returncode = subprocess.call([sys.executable, stage.script, *stage.args], stdout=log, stderr=subprocess.STDOUT, env=env)
+    return returncode, time.perf_counter() - start
+
+def select(stages, targets):
+    # Targets plus everything upstream; manual stages only when named
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in targets if name not in by_name]
+    if unknown:
+        raise SystemExit(f"unknown stage(s): {', '.join(unknown)} (have {', '.join(by_name)})")
+    if not targets:
+        return [stage for stage in stages if not stage.manual]
+    chosen = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in chosen:
+            continue
+        chosen.add(name)
+        pending.extend(dep for dep in upstream(by_name[name], stages)
+                       if not by_name[dep].manual or dep in targets)
+    return [stage for stage in stages if stage.name in chosen]
+
+def run(targets=(), force=False, jobs=4, dry_run=False, plots=True, state_dir=STATE_DIR):
+    stages = select(STAGES, list(targets))
+    if not plots:
+        stages = without_figures(stages)
+    names = {stage.name for stage in stages}
+    deps = {stage.name: [dep for dep in upstream(stage, STAGES) if dep in names] for stage in stages}
+    os.makedirs(os.path.join(state_dir, "logs"), exist_ok=True)
+    state_path = os.path.join(state_dir, "state.json")
+    state = load_state(state_path)
+
+    status = {}
+    timings = {}
+    running = {}
+    pending = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(status) < len(stages):
+            for stage in stages:
+                if stage.name in status or stage.name in pending:
+                    continue
+                if any(status.get(dep) in ("failed", "blocked") for dep in deps[stage.name]):
+                    status[stage.name] = "blocked"
+                    continue
+                if not all(dep in status for dep in deps[stage.name]):
+                    continue
+                if dry_run and any(status[dep] == "would run" for dep in deps[stage.name]):
+                    # Can't know what a stale upstream stage would write
+                    status[stage.name] = "would run"
+                    continue
+                # Inputs are final once every upstream stage has finished
+                try:
+                    key, hashes = fingerprint(stage)
+                except FileNotFoundError as e:
+                    print(f"  {stage.name}: {e}")
+                    status[stage.name] = "blocked"
+                    continue
+                previous = state.get(stage.name, {})
+                if (not force and previous.get("key") == key
+                        and all(os.path.exists(path) for path in stage.outputs)):
+                    status[stage.name] = "skipped"
+                    continue
+                changed = sorted(path for path, digest in hashes.items() if previous.get("files", {}).get(path) != digest)
+                reason = ", ".join(changed) if previous and changed else "forced" if force and previous else \
+                    "missing outputs" if previous else "never run"
+                if dry_run:
+                    print(f"  {stage.name}: {reason}")
+                    status[stage.name] = "would run"
+                    continue
+                print(f"  → {stage.name} ({reason})")
+                log_path = os.path.join(state_dir, "logs", stage.name + ".log")
+                running[pool.submit(run_stage, stage, log_path)] = stage.name
+                pending[stage.name] = (key, hashes)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                key, hashes = pending.pop(name)
+                returncode, seconds = future.result()
+                timings[name] = seconds
+                if returncode == 0:
+                    status[name] = "ran"
+                    state[name] = {"key": key, "files": hashes, "seconds": round(seconds, 2), "finished": time.time()}
+                    save_state(state, state_path)
+                else:
+                    status[name] = "failed"
+                    log_path = os.path.join(state_dir, "logs", name + ".log")
+                    with open(log_path) as f:
+                        tail = f.readlines()[-5:]
+                    print(f"  ✗ {name} exited with {returncode} (log: {log_path})")
+                    print("".join("      " + line for line in tail), end="")
+
+    print(f"\n{'stage':<18} {'status':<10} {'seconds':>8}")
+    for stage in stages:
+        seconds = f"{timings[stage.name]:8.1f}" if stage.name in timings else f"{'-':>8}"
+        print(f"{stage.name:<18} {status[stage.name]:<10} {seconds}")
+    print(f"{'total (wall)':<29} {time.perf_counter() - start:8.1f}")
+    return status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stale stages of the research pipeline")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all non-scrape stages)")
+    parser.add_argument("--force", action="store_true", help="rerun the selected stages even if unchanged")
+    parser.add_argument("--jobs", type=int, default=4, help="max stages running at once")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages are stale")
+    parser.add_argument("--no-plots", action="store_true", help="skip figures (and figure-only stages)")
+    args = parser.parse_args()
+
+    status = run(args.targets, force=args.force, jobs=args.jobs, dry_run=args.dry_run, plots=not args.no_plots)
+    sys.exit(1 if any(value in ("failed", "blocked") for value in status.values()) else 0)
@@ -0,0 +1,76 @@
+import asyncio
+import math
+from collections import namedtuple
+
+# Adaptive slice planner for the async crawl. Instead of the fixed
+# CARAT_RANGES (each truncated at max_pages), start from one wide slice per
+# origin and shape and split it on carat, or on price once a carat band is a
+# single 0.01ct step, until every leaf's numberOfPages fits under the cap.
+# The probe response for each leaf doubles as that leaf's page 1.
+
+# Carat and price bounds are both inclusive in searchByIDs, so children are
+# split at the grid step (0.01ct, $1) to avoid fetching the boundary twice.
+CARAT_STEP = 0.01
+PRICE_MIN = 200
+PRICE_MAX = 5000000
+
+Slice = namedtuple("Slice", ["is_lab", "carat_min", "carat_max", "price_min", "price_max", "shape_id"],
+                   defaults=[PRICE_MIN, PRICE_MAX, 1])
+
+def slice_label(s):
+    label = "lab" if s.is_lab else "natural"
+    text = f"{label} {s.carat_min:.2f}-{s.carat_max:.2f}ct"
+    if (s.price_min, s.price_max) != (PRICE_MIN, PRICE_MAX):
+        text += f" ${s.price_min}-{s.price_max}"
+    if s.shape_id != 1:
+        text += f" shape {s.shape_id}"
+    return text
+
+def root_slices(carat_min=0.3, carat_max=5.0, shape_ids=(1,)):
+    return [Slice(is_lab, carat_min, carat_max, shape_id=shape_id)
+            for shape_id in shape_ids
+            for is_lab in (False, True)]
+
+def split_slice(s, parts=2):
+    # Cut the carat band into `parts` pieces on the 0.01ct grid while it has
+    # more than one step
+    steps = round((s.carat_max - s.carat_min) / CARAT_STEP)
+    if steps >= 1:
+        parts = min(parts, steps + 1)
+        bounds = [s.carat_min + (steps + 1) * i // parts * CARAT_STEP for i in range(parts + 1)]
+        return [s._replace(carat_min=round(lo, 2), carat_max=round(hi - CARAT_STEP, 2))
+                for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    # Prices are roughly log-normal, so halve at the geometric midpoint
+    if s.price_max > s.price_min:
+        mid = int(math.sqrt(s.price_min * s.price_max))
+        mid = min(max(mid, s.price_min), s.price_max - 1)
+        return [s._replace(price_max=mid),
+                s._replace(price_min=mid + 1)]
+
+    return None
+
+async def plan(probe, roots, max_pages=25):
+    # probe(slice) -> first searchByIDs page for that slice, or None.
+    # Returns [(leaf, first_page)] in carat order. Empty leaves are kept so a
+    # stored plan still covers every range and a later delta run probes them
+    # again; leaves whose probe failed are dropped.
+    async def expand(s):
+        search = await probe(s)
+        if search is None:
+            return []
+        if search["numberOfPages"] <= max_pages:
+            return [(s, search)]
+
+        # Aim for children that each fit, assuming stones spread evenly
+        children = split_slice(s, math.ceil(search["numberOfPages"] / max_pages))
+        if children is None:
+            print(f"  {slice_label(s)}: cannot split further, truncating "
+                  f"{search['numberOfPages']} pages to {max_pages}")
+            return [(s, search)]
+
+        results = await asyncio.gather(*[expand(child) for child in children])
+        return [leaf for leaves in results for leaf in leaves]
+
+    results = await asyncio.gather(*[expand(root) for root in roots])
+    return [leaf for leaves in results for leaf in leaves]
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from reddit_scraper import HEADERS, BASE_URL, SUBREDDITS, QUERIES, MIN_YEAR, parse_post, pair_key, apply_watermark, advance_watermark, scope_cut
+from sink import SeenSet
+from transport import AsyncTransport
+
+# Concurrent mode for reddit_scraper.py. All (subreddit, query) pairs
+# paginate at once through one AsyncTransport, so they share a single rate
+# budget. The queries overlap heavily, so a global set of every id returned so
+# far lets a pair stop as soon as a page is almost entirely posts another
+# query already produced. Results are sorted newest first, so a page made up
+# only of pre-MIN_YEAR posts also ends the pair, as does reaching the pair's
+# watermark in incremental mode. A pair's watermark only advances when it was
+# read down to the old mark, to the end of the results, or past MIN_YEAR;
+# a pair cut short (error, max_posts, overlap stop) keeps its old mark, or
+# takes the cut as its scope if it has no mark yet.
+
+class Harvester:
+    def __init__(self, transport, sink, max_posts=250, stop_ratio=0.9, watermarks=None, incremental=False):
+        self.transport = transport
+        self.sink = sink
+        self.max_posts = max_posts
+        self.stop_ratio = stop_ratio
+        self.seen = SeenSet()
+        self.watermarks = watermarks
+        self.incremental = incremental
+        self.pages = 0
+        self.early_stops = 0
+
+    async def harvest_pair(self, subreddit, query):
+        fetched = new = 0
+        after = None
+        key = pair_key(subreddit, query)
+        newest = None
+        complete = False
+
+        while fetched < self.max_posts:
+            params = {
+                'q': query,
+                'sort': 'new',
+                'limit': 100,
+                't': 'all',
+                'restrict_sr': True
+            }
+            if after:
+                params['after'] = after
+
+            try:
+                response = await self.transport.get(BASE_URL.format(subreddit), params=params, label=key)
+                if response.status_code != 200:
+                    print(f"  r/{subreddit} '{query}': status {response.status_code} - stopping")
+                    break
+                data = response.json()['data']
+            except Exception as e:
+                print(f"  r/{subreddit} '{query}': error {e}")
+                break
+
+            children = data['children']
+            if not children:
+                complete = True
+                break
+            self.pages += 1
+
+            start = time.perf_counter()
+            posts = [parse_post(child['data'], subreddit, query) for child in children]
+            newest = max([newest or 0] + [post['created_utc'] for post in posts])
+            posts, reached_mark = apply_watermark(posts, self.watermarks, key, self.incremental)
+            fetched += len(posts)
+            already = sum(not self.seen.add(int(post['id'], 36)) for post in posts)
+            new += self.sink.write([post for post in posts if post['year'] >= MIN_YEAR])
+            self.transport.telemetry.page(key, len(children), time.perf_counter() - start)
+
+            after = data.get('after')
+            if not after or reached_mark:
+                complete = True
+                break
+            if posts and already >= self.stop_ratio * len(posts):
+                complete = scope_cut(self.watermarks, key)
+                self.early_stops += 1
+                break
+            if posts and all(post['year'] < MIN_YEAR for post in posts):
+                # Everything further down is older still and would be dropped
+                complete = True
+                self.early_stops += 1
+                break
+        else:
+            complete = scope_cut(self.watermarks, key)
+
+        if complete:
+            advance_watermark(self.watermarks, key, newest)
+        print(f"  r/{subreddit} '{query}' → {fetched} posts, {new} new")
+        return fetched
+
+async def harvest(sink, subreddits=SUBREDDITS, queries=QUERIES, max_posts=250, concurrency=4, rate=1.0,
+                  stop_ratio=0.9, cache=None, watermarks=None, incremental=False, telemetry=None):
+    async with AsyncTransport(HEADERS, cache=cache, concurrency=concurrency, rate=rate,
+                              telemetry=telemetry) as transport:
+        harvester = Harvester(transport, sink, max_posts=max_posts, stop_ratio=stop_ratio,
+                              watermarks=watermarks, incremental=incremental)
+        await asyncio.gather(*[
+            harvester.harvest_pair(subreddit, query)
+            for subreddit in subreddits
+            for query in queries
+        ])
+    print(f"\n{transport.requests} requests ({transport.retries} retries), {harvester.pages} pages, "
+          f"{harvester.early_stops} pairs stopped early")
+    return harvester
+
+def run(sink, concurrency=4, rate=1.0, stop_ratio=0.9, cache=None, watermarks=None, incremental=False,
+        telemetry=None):
+    start = time.perf_counter()
+    harvester = asyncio.run(harvest(sink, concurrency=concurrency, rate=rate, stop_ratio=stop_ratio, cache=cache,
+                                    watermarks=watermarks, incremental=incremental, telemetry=telemetry))
+    print(f"Concurrent harvest finished in {time.perf_counter() - start:.1f}s")
+    return harvester
@@ -1,8 +1,13 @@
-import requests
-import pandas as pd
+import argparse
+import json
+import os
 import time
 from datetime import datetime
 
+import http_cache
+import telemetry
+from transport import Transport
+
 HEADERS = {'User-Agent': 'diamond_research/1.0'}
 BASE_URL = "https://www.reddit.com/r/{}/search.json"
 
@@ -19,11 +24,111 @@ QUERIES = [
     'natural vs lab'
 ]
 
-def scrape_subreddit_query(subreddit, query, max_posts=250):
-    posts = []
+# Column types for the streamed reddit_raw output (see sink.py)
+POST_SCHEMA = {
+    'id': 'string',
+    'subreddit': 'category',
+    'query': 'category',
+    'created_utc': 'float64',
+    'date': 'string',
+    'year': 'int16',
+    'month': 'int8',
+    'title': 'string',
+    'text': 'string',
+    'score': 'int64',
+    'num_comments': 'int64',
+    'upvote_ratio': 'float64',
+    'url': 'string'
+}
+
+MIN_YEAR = 2015
+
+def post_sink(path='reddit_raw.parquet', resume=False, base=None):
+    from sink import RecordSink
+    # Reddit ids are base-36 integers
+    return RecordSink(path, POST_SCHEMA, key='id', key_func=lambda post_id: int(post_id, 36),
+                      order_by='created_utc', resume=resume, base=base)
+
+# ── WATERMARKS ───────────────────────────────────────────────────
+# Newest created_utc seen per (subreddit, query). Search results come back
+# newest first, so an incremental run can stop a pair at the first post at or
+# below its mark.
+WATERMARKS = 'reddit_watermarks.json'
+
+def pair_key(subreddit, query):
+    return f'{subreddit}|{query}'
+
+def load_watermarks(path=WATERMARKS, corpus=None):
+    watermarks = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            watermarks = json.load(f)
+    missing = [pair_key(subreddit, query) for subreddit in SUBREDDITS for query in QUERIES
+               if watermarks.get(pair_key(subreddit, query)) is None]
+    if missing and corpus is not None and os.path.exists(corpus):
+        # Pairs without a mark are seeded from the corpus. A post only records
+        # the first query that found it, so these marks err on the old side (safe).
+        from dataset import read_file
+        df = read_file(corpus, POST_SCHEMA, columns=['subreddit', 'query', 'created_utc'])
+        newest = df.groupby(['subreddit', 'query'], observed=True)['created_utc'].max()
+        for (subreddit, query), mark in newest.items():
+            if pair_key(subreddit, query) in missing:
+                watermarks[pair_key(subreddit, query)] = float(mark)
+    return watermarks
+
+def save_watermarks(watermarks, path=WATERMARKS):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def apply_watermark(posts, watermarks, key, incremental):
+    # Returns (posts newer than the pair's mark, reached_mark); the mark itself
+    # only moves in advance_watermark, once the pair has been read down to it
+    if watermarks is None or not incremental or watermarks.get(key) is None:
+        return posts, False
+    mark = watermarks[key]
+    fresh = [post for post in posts if post['created_utc'] > mark]
+    return fresh, len(fresh) < len(posts)
+
+def advance_watermark(watermarks, key, newest):
+    # Called only when every post between the old mark and newest was
+    # fetched; a pair cut short (error, max_posts) keeps its old mark
+    if watermarks is not None and newest is not None:
+        watermarks[key] = max(newest, watermarks.get(key) or newest)
+
+def scope_cut(watermarks, key):
+    # A pair with no mark yet takes a max_posts (or overlap) cut as its crawl
+    # scope (a full run never reads past max_posts either), so it still gets
+    # a mark
+    return watermarks is not None and watermarks.get(key) is None
+
+def parse_post(post, subreddit, query):
+    created = datetime.utcfromtimestamp(post.get('created_utc', 0))
+    return {
+        'id': post.get('id'),
+        'subreddit': subreddit,
+        'query': query,
+        'created_utc': post.get('created_utc'),
+        'date': created.strftime('%Y-%m-%d'),
+        'year': created.year,
+        'month': created.month,
+        'title': post.get('title', ''),
+        'text': post.get('selftext', ''),
+        'score': post.get('score', 0),
+        'num_comments': post.get('num_comments', 0),
+        'upvote_ratio': post.get('upvote_ratio', 0),
+        'url': post.get('url', '')
+    }
+
+# Writes each page of posts to sink; returns the number of posts fetched
+def scrape_subreddit_query(subreddit, query, sink, transport, max_posts=250, watermarks=None, incremental=False):
+    fetched = 0
     after = None
+    key = pair_key(subreddit, query)
+    newest = None
+    complete = False
     
-    while len(posts) < max_posts:
+    while fetched < max_posts:
         params = {
             'q': query,
             'sort': 'new',
@@ -35,11 +140,7 @@ def scrape_subreddit_query(subreddit, query, max_posts=250):
             params['after'] = after
             
         try:
-            response = requests.get(
-                BASE_URL.format(subreddit),
-                headers=HEADERS,
-                params=params
-            )
+            response = transport.get(BASE_URL.format(subreddit), params=params, label=key)
             
             if response.status_code != 200:
                 print(f"  Status {response.status_code} - stopping")
@@ -49,60 +150,97 @@ def scrape_subreddit_query(subreddit, query, max_posts=250):
             children = data['children']
             
             if not children:
+                complete = True
                 break
                 
-            for child in children:
-                post = child['data']
-                posts.append({
-                    'id': post.get('id'),
-                    'subreddit': subreddit,
-                    'query': query,
-                    'created_utc': post.get('created_utc'),
-                    'date': datetime.utcfromtimestamp(post.get('created_utc', 0)).strftime('%Y-%m-%d'),
-                    'year': datetime.utcfromtimestamp(post.get('created_utc', 0)).year,
-                    'month': datetime.utcfromtimestamp(post.get('created_utc', 0)).month,
-                    'title': post.get('title', ''),
-                    'text': post.get('selftext', ''),
-                    'score': post.get('score', 0),
-                    'num_comments': post.get('num_comments', 0),
-                    'upvote_ratio': post.get('upvote_ratio', 0),
-                    'url': post.get('url', '')
-                })
+            start = time.perf_counter()
+            posts = [parse_post(child['data'], subreddit, query) for child in children]
+            newest = max([newest or 0] + [post['created_utc'] for post in posts])
+            posts, reached_mark = apply_watermark(posts, watermarks, key, incremental)
+            sink.write([post for post in posts if post['year'] >= MIN_YEAR])
+            transport.telemetry.page(key, len(children), time.perf_counter() - start)
+            fetched += len(posts)
             
             after = data.get('after')
-            if not after:
+            if not after or reached_mark:
+                complete = True
                 break
                 
-            time.sleep(1)
-            
         except Exception as e:
             print(f"  Error: {e}")
             break
+    else:
+        complete = scope_cut(watermarks, key)
     
-    return posts
-
-all_posts = []
-
-for subreddit in SUBREDDITS:
-    print(f"\nScraping r/{subreddit}...")
-    for query in QUERIES:
-        print(f"  Query: '{query}'", end=' ')
-        posts = scrape_subreddit_query(subreddit, query, max_posts=250)
-        all_posts.extend(posts)
-        print(f"→ {len(posts)} posts")
-        time.sleep(1.5)
-
-df = pd.DataFrame(all_posts)
-df = df.drop_duplicates(subset='id')
-df = df[df['year'] >= 2015]
-df = df.sort_values('created_utc')
-
-df.to_csv('reddit_raw.csv', index=False)
-
-print(f"\nDone!")
-print(f"Total unique posts: {len(df)}")
-print(f"Date range: {df['date'].min()} to {df['date'].max()}")
-print(f"\nPosts by year:")
-print(df.groupby('year').size())
-print(f"\nPosts by subreddit:")
-print(df.groupby('subreddit').size())
\ No newline at end of file
+    if complete:
+        advance_watermark(watermarks, key, newest)
+    return fetched
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Collect diamond-related posts from Reddit search')
+    parser.add_argument('--out', default='reddit_raw.parquet', help='output file (.parquet or .csv, see dataset.py)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='harvest all subreddit/query pairs concurrently (see reddit_harvester.py)')
+    parser.add_argument('--concurrency', type=int, default=4, help='max in-flight requests in async mode')
+    parser.add_argument('--rate', type=float, default=1.0, help='max requests per second in async mode')
+    parser.add_argument('--stop-ratio', type=float, default=0.9,
+                        help='async mode: stop a pair once this share of a page was already seen')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only fetch posts newer than each pair\'s watermark and append them to --out')
+    parser.add_argument('--watermarks', default=WATERMARKS)
+    http_cache.add_arguments(parser)
+    telemetry.add_arguments(parser)
+    args = parser.parse_args(argv)
+    cache = http_cache.from_args(args)
+    stats = telemetry.from_args(args)
+    out = args.out
+
+    watermarks = load_watermarks(args.watermarks, corpus=out if args.incremental else None)
+    base = out if args.incremental else None
+
+    with post_sink(out, base=base) as sink:
+        if args.use_async:
+            import reddit_harvester
+            reddit_harvester.run(sink, concurrency=args.concurrency, rate=args.rate,
+                                 stop_ratio=args.stop_ratio, cache=cache,
+                                 watermarks=watermarks, incremental=args.incremental, telemetry=stats)
+        else:
+            # Live requests are paced 1s apart, as Reddit's unauthenticated API expects
+            transport = Transport(HEADERS, cache=cache, min_interval=1.0, telemetry=stats)
+            for subreddit in SUBREDDITS:
+                print(f"\nScraping r/{subreddit}...")
+                for query in QUERIES:
+                    print(f"  Query: '{query}'", end=' ')
+                    fetched = scrape_subreddit_query(subreddit, query, sink, transport, max_posts=250,
+                                                     watermarks=watermarks, incremental=args.incremental)
+                    print(f"→ {fetched} posts")
+                    if cache is None or cache.mode != 'replay':
+                        stats.sleep(None, 'pause', 1.5)
+            transport.close()
+    stats.close()
+
+    # Marks only advance once the corpus holding those posts is safely written
+    save_watermarks(watermarks, args.watermarks)
+
+    from dataset import read_file
+    df = read_file(out, POST_SCHEMA, columns=['date', 'year', 'subreddit'])
+
+    print(f"\nDone!")
+    print(f"Total unique posts: {sink.count} ({sink.duplicates} duplicates dropped)")
+    if args.incremental:
+        print(f"New posts this run: {sink.count - sink.base_count}")
+    print(f"Date range: {df['date'].min()} to {df['date'].max()}")
+    print(f"\nPosts by year:")
+    print(df.groupby('year').size())
+    print(f"\nPosts by subreddit:")
+    print(df.groupby('subreddit').size())
+    if cache is not None:
+        print(cache.stats())
+    print(stats.summary_line())
+    if args.report:
+        stats.write(args.report, scraper='reddit', mode='async' if args.use_async else 'sync',
+                    unique=sink.count, duplicates=sink.duplicates)
+        print(f"Telemetry report written to {args.report}")
+
+if __name__ == '__main__':
+    main()
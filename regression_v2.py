@@ -1,89 +1,84 @@
-import pandas as pd
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import statsmodels.api as sm
 import warnings
-warnings.filterwarnings('ignore')
 
-df = pd.read_csv("diamonds_clean.csv")
+from features import MODEL4_COLUMNS
+from premium import KEY_CARATS, delta_band
+from session import Session
 
-# Encode variables
-df['cut_encoded'] = df['cut_id'].map({0: 4, 1: 4, 2: 3, 3: 2, 4: 1}).fillna(2)
-fluor_map = {'NN': 0, 'NEG': 0, 'F': 1, 'SLT': 1, 'M': 2, 'S': 3, 'SB': 4, 'VSB': 4}
-df['fluor_encoded'] = df['fluorescence'].map(fluor_map).fillna(0)
-df['cert_GIA'] = (df['lab_cert'] == 'GIA').astype(int)
-df['origin_natural'] = (~df['is_lab']).astype(int)
-df['ln_price'] = np.log(df['price_usd'])
-df['ln_carat'] = np.log(df['carat'])
-df['origin_x_ln_carat'] = df['origin_natural'] * df['ln_carat']
-df['origin_x_clarity'] = df['origin_natural'] * df['clarity_id']
+# Model 4: model 3 plus carat bunching dummies for psychological price
+# points (see features.py). --no-plots stops after the key findings.
 
-# Add carat bunching dummies for psychological price points
-for threshold in [0.5, 0.7, 0.9, 1.0, 1.5, 2.0, 3.0]:
-    col = f'near_{str(threshold).replace(".","p")}'
-    df[col] = ((df['carat'] >= threshold - 0.05) & 
-               (df['carat'] <= threshold + 0.05)).astype(int)
+def fit_model4(session):
+    # ── MODEL 4: WITH CARAT BUNCHING CONTROLS ───────────────────────
+    print("="*60)
+    print("MODEL 4: Full Model + Carat Bunching Controls")
+    print("="*60)
 
-bunching_cols = ['near_0p5','near_0p7','near_0p9','near_1p0',
-                 'near_1p5','near_2p0','near_3p0']
+    model4 = session.ols(MODEL4_COLUMNS)
+    print(model4.summary())
+    return model4
 
-# ── MODEL 4: WITH CARAT BUNCHING CONTROLS ───────────────────────
-print("="*60)
-print("MODEL 4: Full Model + Carat Bunching Controls")
-print("="*60)
+def key_findings(model4):
+    origin_coef = model4.params['origin_natural']
+    origin_pval = model4.pvalues['origin_natural']
+    carat_interaction = model4.params['origin_x_ln_carat']
+    origin_premium_pct = (np.exp(origin_coef) - 1) * 100
 
-feature_cols = ['ln_carat','cut_encoded','color_id','clarity_id',
-                'fluor_encoded','cert_GIA','origin_natural',
-                'origin_x_ln_carat','origin_x_clarity'] + bunching_cols
+    print("\n" + "="*60)
+    print("KEY FINDINGS - MODEL 4")
+    print("="*60)
+    print(f"Origin premium at mean carat: {origin_premium_pct:.1f}%")
+    print(f"Origin coefficient: {origin_coef:.4f} (p={origin_pval:.2e})")
+    print(f"Carat interaction: {carat_interaction:.4f}")
+    print(f"R-squared: {model4.rsquared:.4f}")
 
-X4 = sm.add_constant(df[feature_cols])
-y4 = df['ln_price']
+    # Premium at specific carat weights
+    print("\nEstimated origin premium at key carat weights (delta-method 95% CI):")
+    for carat, premium_pct, low, high in zip(KEY_CARATS, *delta_band(model4, KEY_CARATS)):
+        print(f"  {carat} carat: {premium_pct:.0f}% premium for natural ({low:.0f}-{high:.0f}%)")
 
-model4 = sm.OLS(y4, X4).fit(cov_type='HC3')
-print(model4.summary())
+def plot_diagnostics(model4):
+    import matplotlib.pyplot as plt
 
-# Key finding
-origin_coef = model4.params['origin_natural']
-origin_pval = model4.pvalues['origin_natural']
-carat_interaction = model4.params['origin_x_ln_carat']
-origin_premium_pct = (np.exp(origin_coef) - 1) * 100
+    origin_coef = model4.params['origin_natural']
+    carat_interaction = model4.params['origin_x_ln_carat']
 
-print("\n" + "="*60)
-print("KEY FINDINGS - MODEL 4")
-print("="*60)
-print(f"Origin premium at mean carat: {origin_premium_pct:.1f}%")
-print(f"Origin coefficient: {origin_coef:.4f} (p={origin_pval:.2e})")
-print(f"Carat interaction: {carat_interaction:.4f}")
-print(f"R-squared: {model4.rsquared:.4f}")
+    # Residual plot
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
 
-# Premium at specific carat weights
-print("\nEstimated origin premium at key carat weights:")
-for carat in [0.5, 1.0, 1.5, 2.0, 3.0]:
-    premium_coef = origin_coef + carat_interaction * np.log(carat)
-    premium_pct = (np.exp(premium_coef) - 1) * 100
-    print(f"  {carat} carat: {premium_pct:.0f}% premium for natural")
+    axes[0].scatter(model4.fittedvalues, model4.resid, alpha=0.2, s=5, color='steelblue')
+    axes[0].axhline(y=0, color='red', linestyle='--')
+    axes[0].set_xlabel('Fitted Values')
+    axes[0].set_ylabel('Residuals')
+    axes[0].set_title('Model 4: Residuals vs Fitted (with bunching controls)')
 
-# Residual plot
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    # Premium by carat visualisation
+    carats = np.linspace(0.3, 5.0, 100)
+    premiums = [(np.exp(origin_coef + carat_interaction * np.log(c)) - 1) * 100
+                for c in carats]
+    axes[1].plot(carats, premiums, color='steelblue', linewidth=2)
+    axes[1].axhline(y=0, color='red', linestyle='--', alpha=0.5)
+    axes[1].set_xlabel('Carat Weight')
+    axes[1].set_ylabel('Estimated Origin Premium (%)')
+    axes[1].set_title('Natural Diamond Premium by Carat Weight')
+    axes[1].grid(True, alpha=0.3)
 
-axes[0].scatter(model4.fittedvalues, model4.resid, alpha=0.2, s=5, color='steelblue')
-axes[0].axhline(y=0, color='red', linestyle='--')
-axes[0].set_xlabel('Fitted Values')
-axes[0].set_ylabel('Residuals')
-axes[0].set_title('Model 4: Residuals vs Fitted (with bunching controls)')
+    plt.tight_layout()
+    plt.savefig('regression_v2_diagnostics.png', dpi=150)
+    plt.show()
+    print("\nSaved to regression_v2_diagnostics.png")
 
-# Premium by carat visualisation
-carats = np.linspace(0.3, 5.0, 100)
-premiums = [(np.exp(origin_coef + carat_interaction * np.log(c)) - 1) * 100 
-            for c in carats]
-axes[1].plot(carats, premiums, color='steelblue', linewidth=2)
-axes[1].axhline(y=0, color='red', linestyle='--', alpha=0.5)
-axes[1].set_xlabel('Carat Weight')
-axes[1].set_ylabel('Estimated Origin Premium (%)')
-axes[1].set_title('Natural Diamond Premium by Carat Weight')
-axes[1].grid(True, alpha=0.3)
+def main(plots=True, session=None):
+    warnings.filterwarnings('ignore')
+    model4 = fit_model4(session or Session())
+    key_findings(model4)
+    if plots:
+        plot_diagnostics(model4)
+    return model4
 
-plt.tight_layout()
-plt.savefig('regression_v2_diagnostics.png', dpi=150)
-plt.show()
-print("\nSaved to regression_v2_diagnostics.png")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model 4: hedonic model with carat bunching controls")
+    parser.add_argument("--no-plots", action="store_true", help="skip regression_v2_diagnostics.png (matplotlib is never imported)")
+    args = parser.parse_args()
+    main(plots=not args.no_plots)
@@ -1,7 +1,11 @@
-import requests
-import pandas as pd
+import argparse
 import time
 
+import http_cache
+import telemetry
+from planner import Slice, slice_label
+from transport import Transport
+
 URL = "https://www.jamesallen.com/service-api/ja-product-api/diamond/v/2/"
 
 HEADERS = {
@@ -18,18 +22,18 @@ HEADERS = {
 QUERY = "query ($currency: currencies, $isOnSale: Boolean, $sort: sortBy, $lab: [Int] , $price: intRange, $page: pager, $depth: floatRange, $ratio: floatRange, $carat: floatRange, $tableSize: floatRange, $color: intRange, $cut: intRange, $shapeID: [Int], $clarity: intRange, $shippingDays: Int, $isExpressShipping: Boolean, $addBannerPlaceholder: Boolean, $colorIntensityID: [Int]\n    $isFancy: Boolean, $isLabDiamond: Boolean, $polish: [Int], $symmetry: [Int], $flour: [Int], $fancyColorID: Int, $supplierID: Int) {\n    searchByIDs(currency : $currency ,lab: $lab ,isOnSale: $isOnSale, sort: $sort, price: $price, page: $page, depth: $depth, ratio: $ratio, carat: $carat, tableSize: $tableSize, color: $color, cut: $cut, shapeID: $shapeID, clarity: $clarity, shippingDays: $shippingDays, isExpressShipping: $isExpressShipping, addBannerPlaceholder: $addBannerPlaceholder, colorIntensityID: $colorIntensityID, isFancy: $isFancy, isLabDiamond: $isLabDiamond, polish: $polish, symmetry:$symmetry, flour: $flour, fancyColorID: $fancyColorID, supplierID: $supplierID) {\n      hits\n      pageNumber\n      numberOfPages\n      total\n      items {\n        \n    productID\n    sku\n    price\n    stone {\n      isLabDiamond\n      carat\n      depth\n      tableSize\n      shape { id name }\n      color { id name }\n      cut { id name }\n      clarity { id name }\n      lab { id name }\n      flour { id name }\n      symmetry { id name }\n      polish { id name }\n    }\n    \n      }\n    }\n  }\n  "
 
 # Scrape a specific carat range to get coverage across the full price distribution
-def build_payload(page_number, is_lab, carat_min, carat_max):
+def build_payload(page_number, is_lab, carat_min, carat_max, price_min=200, price_max=5000000, shape_id=1):
     return {
         "query": QUERY,
         "variables": {
-            "price": {"from": 200, "to": 5000000},
+            "price": {"from": price_min, "to": price_max},
             "page": {"count": 4, "size": 50, "number": page_number},
             "depth": {"from": 46, "to": 78},
             "carat": {"from": carat_min, "to": carat_max},
             "tableSize": {"from": 50, "to": 80},
             "color": {"from": 1, "to": 10},
             "cut": {"from": 0, "to": 3},
-            "shapeID": [1],
+            "shapeID": [shape_id],
             "clarity": {"from": 1, "to": 9},
             "shippingDays": 999,
             "polish": [4, 3, 2],
@@ -48,65 +52,106 @@ def extract_items(raw_items):
         return raw_items[0]
     return raw_items
 
-def scrape_range(is_lab, carat_min, carat_max, max_pages=25):
-    all_diamonds = []
+# Flatten one searchByIDs item into a diamonds_raw.csv row
+def parse_item(item):
+    if not isinstance(item, dict):
+        return None
+    stone = item.get("stone", {})
+    if not stone:
+        return None
+    return {
+        "productID": item.get("productID"),
+        "price_usd": item.get("price"),
+        "is_lab": stone.get("isLabDiamond"),
+        "carat": stone.get("carat"),
+        "depth_pct": stone.get("depth"),
+        "table_pct": stone.get("tableSize"),
+        "color_id": stone.get("color", {}).get("id"),
+        "color_name": stone.get("color", {}).get("name"),
+        "cut_id": stone.get("cut", {}).get("id"),
+        "cut_name": stone.get("cut", {}).get("name"),
+        "clarity_id": stone.get("clarity", {}).get("id"),
+        "clarity_name": stone.get("clarity", {}).get("name"),
+        "lab_cert": stone.get("lab", {}).get("name"),
+        "fluorescence": stone.get("flour", {}).get("name"),
+        "symmetry": stone.get("symmetry", {}).get("name"),
+        "polish": stone.get("polish", {}).get("name"),
+        "shape": stone.get("shape", {}).get("name"),
+    }
+
+def parse_items(raw_items):
+    records = []
+    for item in extract_items(raw_items):
+        record = parse_item(item)
+        if record is not None:
+            records.append(record)
+    return records
+
+# Column types for the streamed diamonds_raw output (see sink.py)
+DIAMOND_SCHEMA = {
+    "productID": "int64",
+    "price_usd": "int64",
+    "is_lab": "bool",
+    "carat": "float64",
+    "depth_pct": "float64",
+    "table_pct": "float64",
+    "color_id": "int8",
+    "color_name": "category",
+    "cut_id": "int8",
+    "cut_name": "category",
+    "clarity_id": "int8",
+    "clarity_name": "category",
+    "lab_cert": "category",
+    "fluorescence": "category",
+    "symmetry": "category",
+    "polish": "category",
+    "shape": "category",
+}
+
+def diamond_sink(path="diamonds_raw.parquet", resume=False):
+    from sink import RecordSink
+    return RecordSink(path, DIAMOND_SCHEMA, key="productID", resume=resume)
+
+def write_page(pages, raw_items, telemetry, label):
+    start = time.perf_counter()
+    n = pages.write(raw_items)
+    telemetry.page(label, n, time.perf_counter() - start)
+    return n
+
+# Writes each page to a columnar.PageWriter as it arrives; returns the number of stones seen
+def scrape_range(is_lab, carat_min, carat_max, pages, transport, max_pages=25, url=URL):
     label = "lab" if is_lab else "natural"
+    # Same slice labels as the async crawl, for the telemetry report
+    key = slice_label(Slice(is_lab, carat_min, carat_max))
 
     try:
-        response = requests.post(URL, headers=HEADERS, json=build_payload(1, is_lab, carat_min, carat_max))
+        response = transport.post(url, json=build_payload(1, is_lab, carat_min, carat_max), label=key)
         data = response.json()
         if not data.get("data"):
-            return []
+            return 0
         search = data["data"]["searchByIDs"]
         total_pages = min(search["numberOfPages"], max_pages)
         print(f"  {label} {carat_min}-{carat_max}ct: {search['total']} diamonds, scraping {total_pages} pages")
     except Exception as e:
         print(f"  Error on first request: {e}")
-        return []
+        return 0
 
-    for page in range(1, total_pages + 1):
+    # Page 1 was already fetched to read numberOfPages
+    collected = write_page(pages, search["items"], transport.telemetry, key)
+
+    for page in range(2, total_pages + 1):
         try:
-            response = requests.post(URL, headers=HEADERS, json=build_payload(page, is_lab, carat_min, carat_max))
+            response = transport.post(url, json=build_payload(page, is_lab, carat_min, carat_max), label=key)
             data = response.json()
             if not data.get("data"):
                 break
-            raw_items = data["data"]["searchByIDs"]["items"]
-            items = extract_items(raw_items)
-
-            for item in items:
-                if not isinstance(item, dict):
-                    continue
-                stone = item.get("stone", {})
-                if not stone:
-                    continue
-                record = {
-                    "productID": item.get("productID"),
-                    "price_usd": item.get("price"),
-                    "is_lab": stone.get("isLabDiamond"),
-                    "carat": stone.get("carat"),
-                    "depth_pct": stone.get("depth"),
-                    "table_pct": stone.get("tableSize"),
-                    "color_id": stone.get("color", {}).get("id"),
-                    "color_name": stone.get("color", {}).get("name"),
-                    "cut_id": stone.get("cut", {}).get("id"),
-                    "cut_name": stone.get("cut", {}).get("name"),
-                    "clarity_id": stone.get("clarity", {}).get("id"),
-                    "clarity_name": stone.get("clarity", {}).get("name"),
-                    "lab_cert": stone.get("lab", {}).get("name"),
-                    "fluorescence": stone.get("flour", {}).get("name"),
-                    "symmetry": stone.get("symmetry", {}).get("name"),
-                    "polish": stone.get("polish", {}).get("name"),
-                    "shape": stone.get("shape", {}).get("name"),
-                }
-                all_diamonds.append(record)
-
-            time.sleep(0.3)
+            collected += write_page(pages, data["data"]["searchByIDs"]["items"], transport.telemetry, key)
 
         except Exception as e:
             print(f"  Error on page {page}: {e}")
             break
 
-    return all_diamonds
+    return collected
 
 # Scrape across carat ranges to get full price distribution
 # Each range gets 25 pages = ~1250 diamonds per range
@@ -119,24 +164,72 @@ CARAT_RANGES = [
     (3.0, 5.0),
 ]
 
-all_diamonds = []
-
-for carat_min, carat_max in CARAT_RANGES:
-    print(f"\nScraping {carat_min}-{carat_max} carat range...")
-    natural = scrape_range(is_lab=False, carat_min=carat_min, carat_max=carat_max, max_pages=25)
-    lab = scrape_range(is_lab=True, carat_min=carat_min, carat_max=carat_max, max_pages=25)
-    all_diamonds.extend(natural)
-    all_diamonds.extend(lab)
-    print(f"  Collected {len(natural)} natural and {len(lab)} lab so far in this range")
-    print(f"  Running total: {len(all_diamonds)} diamonds")
-    time.sleep(1)
-
-df = pd.DataFrame(all_diamonds)
-df = df.drop_duplicates(subset="productID")
-df.to_csv("diamonds_raw.csv", index=False)
-
-print(f"\nDone! {len(df)} unique diamonds saved to diamonds_raw.csv")
-print(f"Natural: {len(df[df['is_lab']==False])}, Lab: {len(df[df['is_lab']==True])}")
-print(f"\nPrice range: ${df['price_usd'].min()} - ${df['price_usd'].max()}")
-print(f"Carat range: {df['carat'].min()} - {df['carat'].max()}")
-print(df.head())
\ No newline at end of file
+def scrape_all(sink, transport, max_pages=25, url=URL):
+    from columnar import PageWriter
+    pages = PageWriter(sink)
+    try:
+        for carat_min, carat_max in CARAT_RANGES:
+            print(f"\nScraping {carat_min}-{carat_max} carat range...")
+            natural = scrape_range(False, carat_min, carat_max, pages, transport, max_pages=max_pages, url=url)
+            lab = scrape_range(True, carat_min, carat_max, pages, transport, max_pages=max_pages, url=url)
+            pages.flush()
+            print(f"  Collected {natural} natural and {lab} lab so far in this range")
+            print(f"  Running total: {sink.count} unique diamonds")
+            if transport.cache is None or transport.cache.mode != "replay":
+                transport.telemetry.sleep(None, "pause", 1)
+    finally:
+        # Rows still buffered reach the sink before it is closed or left to resume
+        pages.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape round diamonds from the James Allen search API")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="fetch all slices concurrently (see async_scraper.py)")
+    parser.add_argument("--concurrency", type=int, default=8, help="max in-flight requests in async mode")
+    parser.add_argument("--rate", type=float, default=4.0, help="max requests per second in async mode")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="async mode: split slices on carat/price until none hits --max-pages (see planner.py)")
+    parser.add_argument("--shapes", type=int, nargs="+", default=[1], help="shapeIDs to crawl in async mode")
+    parser.add_argument("--store", help="async mode: SQLite crawl store for checkpoints and price history (see store.py)")
+    parser.add_argument("--delta", action="store_true",
+                        help="with --store: only record new listings and price changes in price_history")
+    parser.add_argument("--fresh", action="store_true", help="with --store: start a new run instead of resuming")
+    parser.add_argument("--max-pages", type=int, default=25)
+    parser.add_argument("--url", default=URL, help="API endpoint (point at stub_server.py for offline runs)")
+    parser.add_argument("--out", default="diamonds_raw.parquet", help="output file (.parquet or .csv, see dataset.py)")
+    parser.add_argument("--resume-output", action="store_true",
+                        help="keep chunks already flushed to <out>.parts by an interrupted run")
+    http_cache.add_arguments(parser)
+    telemetry.add_arguments(parser)
+    args = parser.parse_args(argv)
+    cache = http_cache.from_args(args)
+    stats = telemetry.from_args(args)
+
+    with diamond_sink(args.out, resume=args.resume_output) as sink:
+        if args.use_async:
+            import async_scraper
+            async_scraper.run(sink, max_pages=args.max_pages, concurrency=args.concurrency,
+                              rate=args.rate, url=args.url, adaptive=args.adaptive,
+                              shape_ids=args.shapes, store_path=args.store,
+                              delta=args.delta, resume=not args.fresh, cache=cache, telemetry=stats)
+        else:
+            # Transport paces live requests 0.3s apart; cache hits aren't paced
+            transport = Transport(HEADERS, cache=cache, min_interval=0.3, telemetry=stats)
+            try:
+                scrape_all(sink, transport, max_pages=args.max_pages, url=args.url)
+            finally:
+                transport.close()
+
+    stats.close()
+    print(f"\nDone! {sink.count} unique diamonds saved to {args.out} "
+          f"({sink.duplicates} duplicates dropped)")
+    if cache is not None:
+        print(cache.stats())
+    print(stats.summary_line())
+    if args.report:
+        stats.write(args.report, scraper="diamonds", mode="async" if args.use_async else "sync",
+                    unique=sink.count, duplicates=sink.duplicates)
+        print(f"Telemetry report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
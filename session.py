@@ -0,0 +1,120 @@
+import argparse
+import importlib
+import time
+from collections import defaultdict
+
+import dataset
+import features
+import ols
+from textstore import TextStore
+
+# Runs any subset of the analysis scripts in one interpreter, sharing what
+# they have in common: each table is loaded once, the feature matrix is
+# built once, each regression specification is fitted once (figures.py
+# reuses regression_v2's model 4), and the sentiment scores and LDA fit are
+# kept for later stages. Every script's main() takes an optional session;
+# run standalone, each gets a fresh one and behaves as before.
+#
+#   python session.py                          # every analysis
+#   python session.py regression figures --no-plots
+
+ANALYSES = ["regression", "regression_v2", "figures", "premium", "spec_search", "fixed_effects", "dedup", "sentiment", "topic_model", "topic_timeseries"]
+
+class Session:
+    def __init__(self):
+        self.cache = {}
+        self.hits = defaultdict(int)
+        self.seconds = {}
+
+    def get(self, key, build):
+        if key in self.cache:
+            self.hits[key] += 1
+            return self.cache[key]
+        start = time.perf_counter()
+        value = self.cache[key] = build()
+        self.seconds[key] = time.perf_counter() - start
+        return value
+
+    def load(self, name, columns=None):
+        # A private copy: the scripts add columns to their frames
+        df = self.get(("table", name), lambda: dataset.load(name))
+        return (df if columns is None else df[columns]).copy()
+
+    def save(self, df, name):
+        path = dataset.save(df, name)
+        # Later stages see the same frame they would read back from the file
+        self.cache[("table", name)] = dataset.to_table(df, dataset.DATASETS[name]).to_pandas()
+        return path
+
+    def text(self):
+        return self.get("text", self.text_store)
+
+    def text_store(self):
+        # The text store, first appending any reddit_raw posts not in it yet
+        # (what textstore.py does), so a fresh checkout needs no extra step
+        store = TextStore()
+        ids = dataset.load("reddit_raw", columns=["id"])["id"]
+        if not ids.isin(store.ids).all():
+            added = store.append(dataset.load("reddit_raw", columns=["id", "title", "text"]))
+            print(f"Text store: {added} posts appended from reddit_raw")
+        return store
+
+    def features(self):
+        return self.get("features", features.load)
+
+    def ols(self, columns, mask=None):
+        # HC3 OLS of ln_price on const + columns (ols.Fit); mask is None or "natural"
+        return self.ols_many([columns], mask)[0]
+
+    def ols_many(self, specs, mask=None):
+        # Specs not fitted yet are fitted together, nested ones from one QR
+        keys = [("ols", tuple(columns), mask) for columns in specs]
+        missing = [list(key[1]) for key in dict.fromkeys(keys) if key not in self.cache]
+        for key in keys:
+            if key in self.cache:
+                self.hits[key] += 1
+        if missing:
+            fm = self.features()
+            rows = ~fm.extras["is_lab"] if mask == "natural" else None
+            start = time.perf_counter()
+            fits = ols.fit_many(fm, missing, rows)
+            seconds = (time.perf_counter() - start) / len(missing)
+            for columns, fit in zip(missing, fits):
+                key = ("ols", tuple(columns), mask)
+                self.cache[key] = fit
+                self.seconds[key] = seconds
+        return [self.cache[key] for key in keys]
+
+    def summary(self):
+        lines = [f"{'cached':<48} {'built (s)':>9} {'reused':>7}"]
+        for key, seconds in self.seconds.items():
+            if key[0] == "ols":
+                label = f"ols, {len(key[1])} regressors" + (f", {key[2]} only" if key[2] else "")
+            else:
+                label = key if isinstance(key, str) else " ".join(key)
+            lines.append(f"{label[:48]:<48} {seconds:9.2f} {self.hits[key]:7d}")
+        return "\n".join(lines)
+
+def run(names=ANALYSES, plots=True, session=None):
+    session = session or Session()
+    timings = {}
+    for name in names:
+        start = time.perf_counter()
+        importlib.import_module(name).main(plots=plots, session=session)
+        timings[name] = time.perf_counter() - start
+    print(f"\n{'analysis':<18} {'seconds':>8}")
+    for name, seconds in timings.items():
+        print(f"{name:<18} {seconds:8.1f}")
+    print(f"{'total':<18} {sum(timings.values()):8.1f}\n")
+    print(session.summary())
+    return session
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis scripts in one process with shared data and fits")
+    parser.add_argument("analyses", nargs="*", help="default: all, in pipeline order: " + ", ".join(ANALYSES))
+    parser.add_argument("--no-plots", action="store_true", help="skip figures (matplotlib is never imported)")
+    args = parser.parse_args()
+    unknown = [name for name in args.analyses if name not in ANALYSES]
+    if unknown:
+        parser.error(f"unknown analysis: {', '.join(unknown)}")
+    run(args.analyses or ANALYSES, plots=not args.no_plots)
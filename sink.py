@@ -0,0 +1,264 @@
+import heapq
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Streaming output for the scrapers. Records are deduplicated as they arrive,
+# buffered into fixed-size batches and flushed to typed Parquet chunks in a
+# staging directory next to the output, so memory stays flat and a crash
+# keeps everything flushed so far. close() stitches the chunks into the final
+# CSV or Parquet file and swaps it into place with an atomic rename. With
+# base=<existing output>, the existing rows are kept, their keys count as
+# seen, and new records are merged in (append-only incremental runs).
+
+ARROW_TYPES = {
+    "bool": pa.bool_(),
+    "int8": pa.int8(),
+    "int16": pa.int16(),
+    "int32": pa.int32(),
+    "int64": pa.int64(),
+    "float32": pa.float32(),
+    "float64": pa.float64(),
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+}
+
+# Nullable pandas dtypes for the same type names
+PANDAS_TYPES = {
+    "bool": "boolean",
+    "int8": "Int8",
+    "int16": "Int16",
+    "int32": "Int32",
+    "int64": "Int64",
+    "float32": "float32",
+    "float64": "float64",
+    "string": "string",
+    "category": "category",
+}
+
+class SeenSet:
+    # Set of int64 keys: recent keys sit in a small Python set and are merged
+    # into a sorted NumPy array (8 bytes per key) every `merge_every` adds
+    def __init__(self, merge_every=65536):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.pending = set()
+        self.merge_every = merge_every
+
+    def __len__(self):
+        return len(self.keys) + len(self.pending)
+
+    def __contains__(self, key):
+        if key in self.pending:
+            return True
+        i = np.searchsorted(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def add(self, key):
+        if key in self:
+            return False
+        self.pending.add(key)
+        if len(self.pending) >= self.merge_every:
+            self.merge()
+        return True
+
+    def add_many(self, keys):
+        # Vectorised add; returns a mask of keys that were new (first occurrence only)
+        keys = np.asarray(keys, dtype=np.int64)
+        fresh = np.zeros(len(keys), dtype=bool)
+        fresh[np.unique(keys, return_index=True)[1]] = True
+        i = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        if len(self.keys):
+            fresh &= self.keys[i] != keys
+        if self.pending:
+            fresh &= np.fromiter((key not in self.pending for key in keys.tolist()), dtype=bool, count=len(keys))
+        self.pending.update(keys[fresh].tolist())
+        if len(self.pending) >= self.merge_every:
+            self.merge()
+        return fresh
+
+    def update(self, keys):
+        self.keys = np.union1d(self.keys, np.asarray(keys, dtype=np.int64))
+
+    def merge(self):
+        if self.pending:
+            self.update(np.fromiter(self.pending, dtype=np.int64, count=len(self.pending)))
+            self.pending.clear()
+
+def arrow_schema(schema):
+    return pa.schema([(name, ARROW_TYPES[kind]) for name, kind in schema.items()])
+
+def to_table(records, schema):
+    columns = []
+    for name, kind in schema.items():
+        values = [record.get(name) for record in records]
+        if kind == "category":
+            columns.append(pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode())
+        else:
+            columns.append(pa.array(values, type=ARROW_TYPES[kind], from_pandas=True))
+    return pa.Table.from_arrays(columns, schema=arrow_schema(schema))
+
+def frame_to_table(df, schema):
+    table = pa.Table.from_pandas(df[list(schema)], schema=arrow_schema(schema), preserve_index=False)
+    return table.replace_schema_metadata(None)
+
+class RecordSink:
+    # schema: {column: type name from ARROW_TYPES}, in output column order.
+    # key: column to deduplicate on; key_func maps it to an int64 for SeenSet.
+    # order_by: optional column to sort the final output on (external merge).
+    def __init__(self, path, schema, key, key_func=int, batch_size=5000, order_by=None, resume=False, base=None):
+        self.path = path
+        self.schema = schema
+        self.key = key
+        self.key_func = key_func
+        self.batch_size = batch_size
+        self.order_by = order_by
+        self.parts_dir = path + ".parts"
+        self.seen = SeenSet()
+        self.buffer = []
+        self.frames = []
+        self.buffered = 0
+        self.parts = []
+        self.count = 0
+        self.duplicates = 0
+        self.base = base if base is not None and os.path.exists(base) else None
+        self.base_count = 0
+
+        if self.base is not None:
+            for records in self.read_base(columns=[key]):
+                self.seen.update([key_func(record[key]) for record in records])
+                self.base_count += len(records)
+            self.count = self.base_count
+
+        if resume and os.path.isdir(self.parts_dir):
+            # Pick up chunks flushed before a crash
+            self.parts = sorted(os.path.join(self.parts_dir, name)
+                                for name in os.listdir(self.parts_dir) if name.endswith(".parquet"))
+            for part in self.parts:
+                keys = pq.read_table(part, columns=[key]).column(key).to_pylist()
+                self.seen.update([key_func(k) for k in keys])
+                self.count += len(keys)
+        elif os.path.isdir(self.parts_dir):
+            shutil.rmtree(self.parts_dir)
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the flushed chunks; RecordSink(..., resume=True) continues from them
+            self.flush()
+
+    def write(self, records):
+        new = 0
+        for record in records:
+            if not self.seen.add(self.key_func(record[self.key])):
+                self.duplicates += 1
+                continue
+            self.buffer.append(record)
+            new += 1
+            self.buffered += 1
+            if self.buffered >= self.batch_size:
+                self.flush()
+        self.count += new
+        return new
+
+    def write_frame(self, df):
+        # Columnar counterpart of write() for typed frames (see columnar.py)
+        if self.key_func is int:
+            keys = df[self.key].to_numpy(dtype=np.int64)
+        else:
+            keys = np.fromiter((self.key_func(k) for k in df[self.key]), dtype=np.int64, count=len(df))
+        fresh = self.seen.add_many(keys)
+        new = int(fresh.sum())
+        self.duplicates += len(df) - new
+        if new:
+            self.frames.append(df[fresh] if new < len(df) else df)
+            self.buffered += new
+            self.count += new
+            if self.buffered >= self.batch_size:
+                self.flush()
+        return new
+
+    def flush(self):
+        if not self.buffered:
+            return
+        tables = []
+        if self.buffer:
+            tables.append(to_table(self.buffer, self.schema))
+        if self.frames:
+            tables.append(frame_to_table(pd.concat(self.frames, ignore_index=True), self.schema))
+        table = pa.concat_tables(tables)
+        if self.order_by is not None:
+            table = table.sort_by(self.order_by)
+        part = os.path.join(self.parts_dir, f"part-{len(self.parts):05d}.parquet")
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self.parts.append(part)
+        self.buffer = []
+        self.frames = []
+        self.buffered = 0
+
+    def read_base(self, columns=None):
+        # Existing output in batches of record dicts
+        if self.base.endswith(".parquet"):
+            for batch in pq.ParquetFile(self.base).iter_batches(batch_size=self.batch_size, columns=columns):
+                yield batch.to_pylist()
+            return
+        text_columns = {name: str for name, kind in self.schema.items()
+                        if kind in ("string", "category") and (columns is None or name in columns)}
+        for chunk in pd.read_csv(self.base, usecols=columns, dtype=text_columns, chunksize=self.batch_size):
+            yield chunk.to_dict("records")
+
+    def iter_tables(self):
+        if self.order_by is None:
+            if self.base is not None:
+                for records in self.read_base():
+                    yield to_table(records, self.schema)
+            for part in self.parts:
+                yield pq.read_table(part)
+            return
+
+        # Each chunk is sorted on flush; k-way merge them a batch at a time
+        def rows(part):
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=1024):
+                yield from batch.to_pylist()
+
+        def base_rows():
+            for records in self.read_base():
+                yield from records
+
+        # The base file was written by an earlier sink, so it is already sorted
+        sources = [rows(part) for part in self.parts]
+        if self.base is not None:
+            sources.append(base_rows())
+
+        batch = []
+        for record in heapq.merge(*sources, key=lambda r: r[self.order_by]):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield to_table(batch, self.schema)
+                batch = []
+        if batch:
+            yield to_table(batch, self.schema)
+
+    def close(self):
+        self.flush()
+        tmp = self.path + ".tmp"
+        if self.path.endswith(".parquet"):
+            with pq.ParquetWriter(tmp, arrow_schema(self.schema)) as writer:
+                for table in self.iter_tables():
+                    writer.write_table(table)
+        else:
+            with open(tmp, "w", newline="") as f:
+                f.write(",".join(self.schema) + "\n")
+                for table in self.iter_tables():
+                    table.to_pandas(integer_object_nulls=True).to_csv(f, header=False, index=False)
+        os.replace(tmp, self.path)
+        shutil.rmtree(self.parts_dir)
+        return self.count
@@ -0,0 +1,86 @@
+import math
+import numpy as np
+
+# Mergeable streaming quantile sketch (a merging t-digest). Values are
+# buffered and folded into weighted centroids in batches: after sorting,
+# every point or centroid is assigned to an integer bucket of the k1 scale
+# function k(q) = compression / (2 pi) * asin(2q - 1), and each bucket becomes
+# one centroid. k1 is steep near q = 0 and 1, so the tails keep small
+# centroids and tail quantiles (the 99th percentile price cut-off) stay
+# accurate. Digests built over separate chunks merge into one.
+
+class TDigest:
+    def __init__(self, compression=500, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 20 * compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.buffer = []
+        self.buffered = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.buffer.append((values, np.ones(len(values))))
+        self.buffered += len(values)
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        if self.buffered >= self.buffer_size:
+            self.compress()
+
+    def merge(self, other):
+        other.compress()
+        if not other.count:
+            return
+        self.buffer.append((other.means, other.weights))
+        self.buffered += len(other.means)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.buffered >= self.buffer_size:
+            self.compress()
+
+    def compress(self):
+        if not self.buffer:
+            return
+        means = np.concatenate([self.means] + [m for m, w in self.buffer])
+        weights = np.concatenate([self.weights] + [w for m, w in self.buffer])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        # Bucket on k at each item's midpoint quantile
+        mid = (np.cumsum(weights) - weights / 2) / weights.sum()
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * mid - 1)
+        bucket = np.floor(k).astype(np.int64)
+        bucket -= bucket[0]
+        self.weights = np.bincount(bucket, weights=weights)
+        self.means = np.bincount(bucket, weights=means * weights)[self.weights > 0] / self.weights[self.weights > 0]
+        self.weights = self.weights[self.weights > 0]
+        self.buffer = []
+        self.buffered = 0
+
+    def quantile(self, q):
+        # Matches pandas' linear interpolation when every centroid is a single value
+        self.compress()
+        if not self.count:
+            return math.nan
+        positions = np.concatenate([[0.0], np.cumsum(self.weights) - self.weights / 2, [self.count]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        target = np.asarray(q, dtype=np.float64) * (self.count - 1) + 0.5
+        return np.interp(target, positions, values)
+
+    def rank_error_bound(self, q):
+        # Half the widest centroid allowed at q (one unit of k), as a fraction of count
+        return math.pi * math.sqrt(q * (1 - q)) / self.compression
+
+    def centroids(self):
+        self.compress()
+        return len(self.means)
@@ -0,0 +1,184 @@
+import argparse
+import itertools
+import math
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import features
+from features import MODEL4_COLUMNS
+from session import Session
+
+# Specification curve for the origin coefficient. Specs combine
+#   controls:      any subset of CONTROLS (ln_carat and origin always in)
+#   interactions:  origin x each of INTERACTIONS, only with its main effect
+#   bunching:      none, or the round or full threshold list at each window
+#   sample:        SAMPLES
+# Each (sample, bunching) group builds the cross-product matrix of all its
+# candidate columns once, then visits the control/interaction subsets in
+# Gray-code order: every step adds or drops one column, which is one sweep
+# (or reverse sweep) of that matrix, O(p^2), after which it holds the
+# coefficients, RSS and (X'X)^-1 of the current spec. Only the HC3 standard
+# error of the origin coefficient goes back to the rows (one pass for the
+# leverages). Groups are spread over a process pool. The table, sorted by
+# coefficient, is written to spec_curve.csv.
+#
+#   python spec_search.py --jobs 8
+
+CONTROLS = ['cut_encoded', 'color_id', 'clarity_id', 'fluor_encoded', 'cert_GIA']
+# Interaction column -> the main effect it requires
+INTERACTIONS = {'origin_x_ln_carat': 'ln_carat', 'origin_x_clarity': 'clarity_id',
+                'origin_x_color': 'color_id', 'origin_x_cut': 'cut_encoded'}
+BASE = ['const', 'ln_carat', 'origin_natural']
+ROUND_CARATS = [1.0, 1.5, 2.0, 3.0]
+WINDOWS = [0.02, 0.05, 0.1]
+BUNCHING = [('none', [], 0.0)] + [(name, thresholds, window)
+                                  for name, thresholds in [('round', ROUND_CARATS), ('all', features.SPEC['bunching'])]
+                                  for window in WINDOWS]
+SAMPLES = {
+    'all': lambda fm: np.ones(len(fm), dtype=bool),
+    'gia_only': lambda fm: fm.values[:, fm.index['cert_GIA']] == 1,
+    'under_2ct': lambda fm: fm.extras['carat'] <= 2.0,
+    'over_0.5ct': lambda fm: fm.extras['carat'] >= 0.5,
+}
+
+def bunching_name(threshold, window):
+    return f"{features.bunching_column(threshold)}_w{window}"
+
+def candidates(fm):
+    # -> (names, matrix) of every column any spec can use
+    columns = {name: fm.values[:, fm.index[name]] for name in BASE + CONTROLS + ['origin_x_ln_carat', 'origin_x_clarity']}
+    columns['origin_x_color'] = columns['origin_natural'] * columns['color_id']
+    columns['origin_x_cut'] = columns['origin_natural'] * columns['cut_encoded']
+    carat = fm.extras['carat']
+    for threshold, window in itertools.product(features.SPEC['bunching'], WINDOWS):
+        columns[bunching_name(threshold, window)] = ((carat >= threshold - window) & (carat <= threshold + window)).astype(np.float64)
+    return list(columns), np.column_stack(list(columns.values()))
+
+def sweep(G, k, inverse=False):
+    # Sweep (inverse=False) or reverse-sweep the symmetric matrix G on pivot k
+    d = G[k, k]
+    col = G[:, k].copy()
+    G -= np.outer(col, col) / d
+    G[:, k] = G[k, :] = (-col if inverse else col) / d
+    G[k, k] = -1 / d
+
+# ── WORKERS ──────────────────────────────────────────────────────────
+# Each worker process gets the candidate matrix once (initializer); tasks
+# are (sample, bunching) groups.
+_DATA = {}
+
+def _init(names, Z, y, samples):
+    _DATA.clear()
+    _DATA.update(index={name: i for i, name in enumerate(names)}, Z=Z, y=y, samples=samples)
+
+def _search(task):
+    sample, bunching, thresholds, window = task
+    index = _DATA['index']
+    rows = _DATA['samples'][sample]
+    Z, y = _DATA['Z'][rows], _DATA['y'][rows]
+    # Columns constant in this sample (cert_GIA among GIA stones, an empty
+    # bunching window) can't be estimated next to the constant
+    varying = Z.max(axis=0) > Z.min(axis=0)
+    dummies = [name for name in (bunching_name(t, window) for t in thresholds) if varying[index[name]]]
+    toggles = [name for name in CONTROLS + list(INTERACTIONS) if varying[index[name]]]
+    names = BASE + dummies + toggles
+    X = Z[:, [index[name] for name in names]]
+    # Unit-length columns keep the sweeps well conditioned
+    scale = 1 / np.sqrt((X ** 2).sum(axis=0))
+    X = X * scale
+    p = len(names)
+    G = np.empty((p + 1, p + 1))
+    G[:p, :p] = X.T @ X
+    G[:p, p] = G[p, :p] = X.T @ y
+    G[p, p] = y @ y
+    tss = float(((y - y.mean()) ** 2).sum())
+    for k in range(len(BASE) + len(dummies)):
+        sweep(G, k)
+
+    first = len(BASE) + len(dummies)
+    on = [False] * len(toggles)
+    results = []
+    for step in range(2 ** len(toggles)):
+        if step:
+            # Gray code: step i flips the column at i's lowest set bit
+            bit = (step & -step).bit_length() - 1
+            sweep(G, first + bit, inverse=on[bit])
+            on[bit] = not on[bit]
+        included = {name for name, flag in zip(toggles, on) if flag}
+        if any(name in included and INTERACTIONS[name] not in included | set(BASE) for name in INTERACTIONS):
+            continue
+        S = list(range(first)) + [first + i for i, flag in enumerate(on) if flag]
+        beta = G[S, p]
+        # HC3 for the origin coefficient: row 2 of (X'X)^-1 X' and the leverages
+        Xs = X[:, S]
+        XA = Xs @ -G[np.ix_(S, S)]
+        leverage = np.einsum('ij,ij->i', XA, Xs)
+        resid = y - Xs @ beta
+        se = math.sqrt(float(((XA[:, 2] * resid / (1 - leverage)) ** 2).sum())) * scale[2]
+        coef = beta[2] * scale[2]
+        results.append({
+            'sample': sample, 'bunching': bunching, 'window': window if dummies else None,
+            'controls': '+'.join(name for name in CONTROLS if name in included),
+            'interactions': '+'.join(name for name in INTERACTIONS if name in included),
+            'n': len(y), 'k': len(S),
+            'origin_coef': coef, 'origin_se': se,
+            'pvalue': math.erfc(abs(coef / se) / math.sqrt(2)),
+            'rsquared': 1 - G[p, p] / tss,
+        })
+    return results
+
+def search(fm, jobs=1):
+    names, Z = candidates(fm)
+    samples = {name: np.asarray(rule(fm)) for name, rule in SAMPLES.items()}
+    tasks = [(sample, *bunching) for sample in SAMPLES for bunching in BUNCHING]
+    if jobs == 1:
+        _init(names, Z, fm.target, samples)
+        groups = [_search(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init, initargs=(names, Z, fm.target, samples)) as pool:
+            groups = list(pool.map(_search, tasks))
+    table = pd.DataFrame([row for group in groups for row in group])
+    table = table.sort_values('origin_coef', kind='stable').reset_index(drop=True)
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table
+
+def main(plots=True, session=None, jobs=None):
+    # plots: accepted for session.run(); there is no figure
+    warnings.filterwarnings('ignore')
+    session = session or Session()
+    jobs = jobs or os.cpu_count()
+    start = time.perf_counter()
+    table = search(session.features(), jobs)
+    seconds = time.perf_counter() - start
+    print(f"{len(table)} specifications in {seconds:.1f}s ({jobs} processes)")
+
+    coefs = table['origin_coef']
+    print(f"Origin coefficient: median {coefs.median():.4f}, "
+          f"range {coefs.min():.4f} to {coefs.max():.4f}")
+    significant = (table['pvalue'] < 0.05) & (coefs > 0)
+    print(f"Positive and significant at 5%: {significant.mean():.1%}")
+    print("\nMedian origin coefficient by choice:")
+    for column in ['sample', 'bunching', 'window']:
+        medians = table.groupby(table[column].fillna('-').replace('', 'none'), sort=False)['origin_coef'].median()
+        print(f"  {column}: " + ", ".join(f"{key} {value:.3f}" for key, value in medians.items()))
+
+    # Model 4 is one of the specs
+    model4 = table[(table['sample'] == 'all') & (table['bunching'] == 'all') & (table['window'] == features.SPEC['bunching_window'])
+                   & (table['controls'] == '+'.join(name for name in CONTROLS if name in MODEL4_COLUMNS))
+                   & (table['interactions'] == '+'.join(name for name in INTERACTIONS if name in MODEL4_COLUMNS))]
+    for row in model4.itertuples():
+        print(f"\nModel 4 (rank {row.rank} of {len(table)}): {row.origin_coef:.4f} (HC3 SE {row.origin_se:.4f})")
+
+    table.to_csv('spec_curve.csv', index=False)
+    print("Saved to spec_curve.csv")
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Specification curve of the origin coefficient")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    main(jobs=args.jobs)
@@ -0,0 +1,184 @@
+import sqlite3
+from datetime import datetime, timezone
+import pandas as pd
+
+from planner import Slice
+
+# Persistent crawl store. Listings are keyed by productID, every completed
+# (slice, page) unit is checkpointed so an interrupted crawl resumes where it
+# stopped, and price observations go into an append-only price_history table.
+# In delta mode only new listings and changed prices are written to history.
+
+LISTING_COLUMNS = [
+    "productID", "price_usd", "is_lab", "carat", "depth_pct", "table_pct",
+    "color_id", "color_name", "cut_id", "cut_name", "clarity_id", "clarity_name",
+    "lab_cert", "fluorescence", "symmetry", "polish", "shape",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    delta INTEGER NOT NULL,
+    planned INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS run_slices (
+    run_id INTEGER NOT NULL,
+    slice_key TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    pages INTEGER NOT NULL,
+    PRIMARY KEY (run_id, slice_key)
+);
+CREATE TABLE IF NOT EXISTS run_pages (
+    run_id INTEGER NOT NULL,
+    slice_key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    n_items INTEGER NOT NULL,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, slice_key, page)
+);
+CREATE TABLE IF NOT EXISTS listings (
+    productID INTEGER PRIMARY KEY,
+    price_usd INTEGER, is_lab INTEGER, carat REAL, depth_pct REAL, table_pct REAL,
+    color_id INTEGER, color_name TEXT, cut_id INTEGER, cut_name TEXT,
+    clarity_id INTEGER, clarity_name TEXT, lab_cert TEXT, fluorescence TEXT,
+    symmetry TEXT, polish TEXT, shape TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    last_run INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS price_history (
+    productID INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    observed_at TEXT NOT NULL,
+    price_usd INTEGER
+);
+CREATE INDEX IF NOT EXISTS price_history_product ON price_history (productID);
+CREATE INDEX IF NOT EXISTS listings_last_run ON listings (last_run);
+"""
+
+def now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def slice_key(s):
+    return f"{int(s.is_lab)}|{s.carat_min:.2f}|{s.carat_max:.2f}|{s.price_min}|{s.price_max}|{s.shape_id}"
+
+def parse_slice_key(key):
+    is_lab, carat_min, carat_max, price_min, price_max, shape_id = key.split("|")
+    return Slice(bool(int(is_lab)), float(carat_min), float(carat_max),
+                 int(price_min), int(price_max), int(shape_id))
+
+class CrawlStore:
+    def __init__(self, path="crawl.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ── RUNS ──────────────────────────────────────────────────────
+    def start_run(self, delta=False, resume=True):
+        # Resume the latest unfinished run if there is one
+        if resume:
+            row = self.conn.execute(
+                "SELECT run_id, delta FROM runs WHERE finished_at IS NULL ORDER BY run_id DESC LIMIT 1"
+            ).fetchone()
+            if row:
+                return row[0], bool(row[1]), True
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO runs (started_at, delta) VALUES (?, ?)", (now(), int(delta)))
+        return cur.lastrowid, delta, False
+
+    def finish_run(self, run_id):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (now(), run_id))
+
+    def last_finished_run(self):
+        row = self.conn.execute(
+            "SELECT run_id FROM runs WHERE finished_at IS NOT NULL AND planned = 1 ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    # ── PLAN AND CHECKPOINTS ──────────────────────────────────────
+    def save_slice(self, run_id, s, total, pages):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO run_slices VALUES (?, ?, ?, ?)",
+                              (run_id, slice_key(s), total, pages))
+
+    def mark_planned(self, run_id):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET planned = 1 WHERE run_id = ?", (run_id,))
+
+    def is_planned(self, run_id):
+        return bool(self.conn.execute("SELECT planned FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0])
+
+    def slices(self, run_id):
+        rows = self.conn.execute(
+            "SELECT slice_key, pages FROM run_slices WHERE run_id = ? ORDER BY rowid", (run_id,)
+        ).fetchall()
+        return [(parse_slice_key(key), pages) for key, pages in rows]
+
+    def slice_pages(self, run_id, s):
+        row = self.conn.execute("SELECT pages FROM run_slices WHERE run_id = ? AND slice_key = ?",
+                                (run_id, slice_key(s))).fetchone()
+        return row[0] if row else None
+
+    def completed_pages(self, run_id, s):
+        rows = self.conn.execute("SELECT page FROM run_pages WHERE run_id = ? AND slice_key = ?",
+                                 (run_id, slice_key(s))).fetchall()
+        return {page for (page,) in rows}
+
+    # ── LISTINGS AND PRICE HISTORY ────────────────────────────────
+    def save_page(self, run_id, s, page, records, delta=False):
+        # One transaction per page: the checkpoint only exists if the rows do
+        observed = now()
+        new = changed = 0
+        with self.conn:
+            for record in records:
+                row = self.conn.execute("SELECT price_usd FROM listings WHERE productID = ?",
+                                        (record["productID"],)).fetchone()
+                values = [record[col] for col in LISTING_COLUMNS]
+                if row is None:
+                    new += 1
+                    self.conn.execute(
+                        f"INSERT INTO listings ({', '.join(LISTING_COLUMNS)}, first_seen, last_seen, last_run) "
+                        f"VALUES ({', '.join('?' * len(LISTING_COLUMNS))}, ?, ?, ?)",
+                        values + [observed, observed, run_id])
+                else:
+                    if row[0] != record["price_usd"]:
+                        changed += 1
+                    self.conn.execute(
+                        f"UPDATE listings SET {', '.join(f'{col} = ?' for col in LISTING_COLUMNS[1:])}, "
+                        f"last_seen = ?, last_run = ? WHERE productID = ?",
+                        values[1:] + [observed, run_id, record["productID"]])
+                if not delta or row is None or row[0] != record["price_usd"]:
+                    self.conn.execute("INSERT INTO price_history VALUES (?, ?, ?, ?)",
+                                      (record["productID"], run_id, observed, record["price_usd"]))
+            self.conn.execute("INSERT OR REPLACE INTO run_pages VALUES (?, ?, ?, ?, ?)",
+                              (run_id, slice_key(s), page, len(records), observed))
+        return new, changed
+
+    def iter_run_listings(self, run_id, chunksize=5000):
+        # Current state of every listing seen during this run, in diamonds_raw.csv layout
+        for df in pd.read_sql_query(
+                f"SELECT {', '.join(LISTING_COLUMNS)} FROM listings WHERE last_run = ? ORDER BY rowid",
+                self.conn, params=(run_id,), chunksize=chunksize):
+            df["is_lab"] = df["is_lab"].astype(bool)
+            yield df
+
+    def price_history(self, product_ids=None):
+        query = "SELECT productID, run_id, observed_at, price_usd FROM price_history"
+        if product_ids is not None:
+            ids = ", ".join(str(int(pid)) for pid in product_ids)
+            query += f" WHERE productID IN ({ids})"
+        return pd.read_sql_query(query + " ORDER BY productID, observed_at", self.conn)
+
+    def run_summary(self, run_id):
+        n_listings = self.conn.execute("SELECT COUNT(*) FROM listings WHERE last_run = ?", (run_id,)).fetchone()[0]
+        n_history = self.conn.execute("SELECT COUNT(*) FROM price_history WHERE run_id = ?", (run_id,)).fetchone()[0]
+        n_pages = self.conn.execute("SELECT COUNT(*) FROM run_pages WHERE run_id = ?", (run_id,)).fetchone()[0]
+        return {"listings": n_listings, "history_rows": n_history, "pages": n_pages}
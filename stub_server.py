@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import math
+import random
+import pandas as pd
+from aiohttp import web
+
+# Local stand-in for the James Allen searchByIDs endpoint. Serves stones from
+# diamonds_raw.csv in the same GraphQL response shape (items nested one list
+# deep, as extract_items expects), so the scrapers can be run offline:
+#
+#   python stub_server.py --port 8765 --latency 0.2
+#   python scraper.py --async --url http://localhost:8765/
+#
+# --error-rate and --captcha-rate inject 503/429 responses and the saved
+# Radware captcha page (page_source.html) to exercise transport.py.
+
+def load_stones(path="diamonds_raw.csv"):
+    df = pd.read_csv(path)
+    return df.drop_duplicates(subset="productID").reset_index(drop=True)
+
+def to_item(row):
+    return {
+        "productID": int(row["productID"]),
+        "sku": f"SKU{int(row['productID'])}",
+        "price": int(row["price_usd"]),
+        "stone": {
+            "isLabDiamond": bool(row["is_lab"]),
+            "carat": float(row["carat"]),
+            "depth": float(row["depth_pct"]),
+            "tableSize": float(row["table_pct"]),
+            "shape": {"id": 1, "name": row["shape"]},
+            "color": {"id": int(row["color_id"]), "name": row["color_name"]},
+            "cut": {"id": int(row["cut_id"]), "name": row["cut_name"]},
+            "clarity": {"id": int(row["clarity_id"]), "name": row["clarity_name"]},
+            "lab": {"id": None, "name": row["lab_cert"]},
+            "flour": {"id": None, "name": row["fluorescence"]},
+            "symmetry": {"id": None, "name": row["symmetry"]},
+            "polish": {"id": None, "name": row["polish"]},
+        },
+    }
+
+def search(stones, variables):
+    mask = stones["is_lab"] == bool(variables.get("isLabDiamond"))
+    if 1 not in variables.get("shapeID", [1]):
+        mask &= False
+    carat = variables.get("carat")
+    if carat:
+        mask &= stones["carat"].between(carat["from"], carat["to"])
+    price = variables.get("price")
+    if price:
+        mask &= stones["price_usd"].between(price["from"], price["to"])
+    matches = stones[mask]
+
+    page = variables.get("page", {})
+    size = page.get("size", 50)
+    number = page.get("number", 1)
+    rows = matches.iloc[(number - 1) * size:number * size]
+    return {
+        "hits": len(rows),
+        "pageNumber": number,
+        "numberOfPages": math.ceil(len(matches) / size),
+        "total": len(matches),
+        "items": [[to_item(row) for _, row in rows.iterrows()]],
+    }
+
+def make_app(stones, latency=0.0, error_rate=0.0, captcha_rate=0.0, captcha_page="page_source.html"):
+    with open(captcha_page, encoding="utf-8") as f:
+        captcha_html = f.read()
+
+    async def handle(request):
+        request.app["requests"] += 1
+        body = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        roll = random.random()
+        if roll < captcha_rate:
+            return web.Response(text=captcha_html, content_type="text/html")
+        if roll < captcha_rate + error_rate:
+            if random.random() < 0.5:
+                return web.Response(status=429, headers={"Retry-After": "1"})
+            return web.Response(status=503)
+        result = search(stones, body.get("variables", {}))
+        return web.json_response({"data": {"searchByIDs": result}})
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    app["requests"] = 0
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay diamonds_raw.csv as a searchByIDs endpoint")
+    parser.add_argument("--data", default="diamonds_raw.csv")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of simulated server latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 429/503")
+    parser.add_argument("--captcha-rate", type=float, default=0.0, help="share of requests answered with a captcha page")
+    args = parser.parse_args()
+    app = make_app(load_stones(args.data), args.latency, args.error_rate, args.captcha_rate)
+    web.run_app(app, port=args.port)
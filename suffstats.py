@@ -0,0 +1,228 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import dataset
+import features
+import ols
+from features import MODEL2_COLUMNS, MODEL3_COLUMNS, MODEL4_COLUMNS
+
+# Models 2-4 from sufficient statistics instead of rows. With z = (x, y) for
+# each diamond over the full feature spec, Moments keeps
+#   n,  sum z z'           (X'X, X'y, y'y and sum y through the constant)
+#   sum (z ⊗ z)(z ⊗ z)'    (fourth moments, unique pairs only)
+# All of these are sums over rows, so update() adds a chunk, downdate()
+# subtracts removed listings and merge() adds another shard's totals. fit()
+# solves the normal equations for any subset of the columns, and because
+#   sum e_i^2 x_i x_i' = sum_cd w_c w_d sum z_ic z_id x_i x_i',  w = (-b, 1)
+# the heteroskedasticity-robust meat is exact too. HC3 would need each row's
+# leverage, so these are HC1 errors (HC0 scaled by n / (n - k)).
+#
+# The state lives under .suffstats/: the moments, the productIDs folded in
+# with a hash of each row's feature inputs, and a ledger of those inputs
+# (one part per refresh) so listings that later vanish or change can be
+# downdated. refresh makes one pass over diamonds_clean's LEDGER_COLUMNS,
+# hashing each row and keeping only rows that are new or whose hash changed
+# (store.py reprices existing listings in place); only those rows, and the
+# ledger copies they replace, touch the moments.
+#
+#   python suffstats.py build --jobs 4     # from scratch, sharded
+#   python suffstats.py refresh            # fold in new/changed rows, drop vanished ones
+#   python suffstats.py fit --check        # models 2-4, against ols.py
+
+STATE_DIR = ".suffstats"
+CHUNK_SIZE = 100000
+MODELS = {"Model 2": MODEL2_COLUMNS, "Model 3": MODEL3_COLUMNS, "Model 4": MODEL4_COLUMNS}
+LEDGER_COLUMNS = ["productID"] + features.SOURCE_COLUMNS
+
+class Moments:
+    def __init__(self, columns=None):
+        self.columns = list(columns or features.feature_columns())
+        k = len(self.columns) + 1
+        # Position of z_a * z_b among the unique pairs a <= b
+        upper = np.triu_indices(k)
+        self.pair = np.zeros((k, k), dtype=np.int64)
+        self.pair[upper] = self.pair.T[upper] = np.arange(len(upper[0]))
+        self.upper = upper
+        self.n = 0
+        self.cross = np.zeros((k, k))
+        self.fourth = np.zeros((len(upper[0]), len(upper[0])))
+
+    def rows(self, chunk):
+        # diamonds_clean rows -> z = (features..., ln_price)
+        fm = features.build(chunk)
+        return np.column_stack([fm.values[:, [fm.index[name] for name in self.columns]], fm.target])
+
+    def update(self, chunk, sign=1):
+        Z = self.rows(chunk)
+        pairs = Z[:, self.upper[0]] * Z[:, self.upper[1]]
+        self.n += sign * len(Z)
+        self.cross += sign * (Z.T @ Z)
+        self.fourth += sign * (pairs.T @ pairs)
+        return self
+
+    def downdate(self, chunk):
+        return self.update(chunk, sign=-1)
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("can only merge moments over the same columns")
+        self.n += other.n
+        self.cross += other.cross
+        self.fourth += other.fourth
+        return self
+
+    def fit(self, columns, cov_type="HC1"):
+        # -> ols.Estimates for ln_price on const + columns; cov_type HC0 or HC1
+        names = ["const"] + [name for name in columns if name != "const"]
+        S = [self.columns.index(name) for name in names]
+        y = len(self.columns)
+        xtx = self.cross[np.ix_(S, S)]
+        params = np.linalg.solve(xtx, self.cross[S, y])
+        bread = np.linalg.inv(xtx)
+        # meat[a, b] = sum_cd w_c w_d sum z_a z_b z_c z_d over the spec's columns and y
+        used = S + [y]
+        w = np.append(-params, 1.0)
+        fourth = self.fourth[np.ix_(self.pair[np.ix_(S, S)].ravel(), self.pair[np.ix_(used, used)].ravel())]
+        meat = (fourth @ np.outer(w, w).ravel()).reshape(len(S), len(S))
+        cov = bread @ meat @ bread
+        if cov_type == "HC1":
+            cov *= self.n / (self.n - len(S))
+        ssr = self.cross[y, y] - params @ self.cross[S, y]
+        total = self.cross[self.columns.index("const"), y]
+        tss = self.cross[y, y] - total ** 2 / self.n
+        return ols.Estimates(names, params, cov, self.n, ssr, tss, cov_type=cov_type)
+
+    def save(self, path):
+        tmp = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp, columns=np.array(self.columns), n=self.n, cross=self.cross, fourth=self.fourth)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            moments = cls(f["columns"].tolist())
+            moments.n = int(f["n"])
+            moments.cross = f["cross"]
+            moments.fourth = f["fourth"]
+        return moments
+
+# ── STATE ────────────────────────────────────────────────────────────
+
+def state_paths(state_dir=STATE_DIR):
+    # -> moments, productIDs, their row hashes (aligned with the ids), ledger directory
+    return (os.path.join(state_dir, "moments.npz"), os.path.join(state_dir, "ids.npy"),
+            os.path.join(state_dir, "hashes.npy"), os.path.join(state_dir, "ledger"))
+
+def row_hashes(chunk):
+    return pd.util.hash_pandas_object(chunk[LEDGER_COLUMNS], index=False).to_numpy()
+
+def write_ledger(chunks, ledger_dir):
+    # One parquet part holding the rows folded in by this build/refresh
+    os.makedirs(ledger_dir, exist_ok=True)
+    part = os.path.join(ledger_dir, f"part-{len(os.listdir(ledger_dir)):05d}.parquet")
+    schema = {name: dataset.CLEAN_SCHEMA[name] for name in LEDGER_COLUMNS}
+    with pq.ParquetWriter(part + ".tmp", dataset.to_table(chunks[0][:0], schema).schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_table(dataset.to_table(chunk, schema))
+    os.replace(part + ".tmp", part)
+
+def ledger_rows(ids, ledger_dir):
+    # The latest ledger copy of each listing in ids (parts are read in the
+    # order they were written)
+    wanted = ds.field("productID").isin(pa.array(ids, pa.int64()))
+    parts = [ds.dataset(os.path.join(ledger_dir, name), format="parquet").to_table(filter=wanted)
+             for name in sorted(os.listdir(ledger_dir))]
+    return pa.concat_tables(parts).to_pandas().drop_duplicates("productID", keep="last")
+
+def _shard(chunk):
+    return Moments().update(chunk)
+
+def build(jobs=1, chunk_size=CHUNK_SIZE, state_dir=STATE_DIR):
+    moments_path, ids_path, hashes_path, ledger_dir = state_paths(state_dir)
+    chunks = list(dataset.iter_chunks("diamonds_clean", columns=LEDGER_COLUMNS, chunksize=chunk_size))
+    if jobs == 1:
+        shards = [_shard(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            shards = list(pool.map(_shard, chunks))
+    moments = Moments()
+    for shard in shards:
+        moments.merge(shard)
+    if os.path.isdir(ledger_dir):
+        for name in os.listdir(ledger_dir):
+            os.remove(os.path.join(ledger_dir, name))
+    write_ledger(chunks, ledger_dir)
+    np.save(ids_path, np.concatenate([chunk["productID"].to_numpy(dtype=np.int64) for chunk in chunks]))
+    np.save(hashes_path, np.concatenate([row_hashes(chunk) for chunk in chunks]))
+    moments.save(moments_path)
+    return moments, len(chunks)
+
+def refresh(state_dir=STATE_DIR):
+    # -> (moments, rows added, rows changed, rows removed)
+    moments_path, ids_path, hashes_path, ledger_dir = state_paths(state_dir)
+    moments = Moments.load(moments_path)
+    # productID is the listing key, so both id lists are unique
+    known = pd.Index(np.load(ids_path))
+    known_hashes = np.load(hashes_path)
+    ids, hashes, fresh = [], [], []
+    for chunk in dataset.iter_chunks("diamonds_clean", columns=LEDGER_COLUMNS):
+        chunk_ids = chunk["productID"].to_numpy(dtype=np.int64)
+        chunk_hashes = row_hashes(chunk)
+        at = known.get_indexer(chunk_ids)
+        stale = (at < 0) | (known_hashes[np.maximum(at, 0)] != chunk_hashes)
+        ids.append(chunk_ids)
+        hashes.append(chunk_hashes)
+        fresh.append(chunk[stale])
+    ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    fresh = pd.concat(fresh) if fresh else pd.DataFrame(columns=LEDGER_COLUMNS)
+    fresh_ids = fresh["productID"].to_numpy(dtype=np.int64)
+    changed_ids = fresh_ids[known.get_indexer(fresh_ids) >= 0]
+    gone_ids = known[~known.isin(ids)].to_numpy()
+    if len(gone_ids) or len(changed_ids):
+        moments.downdate(ledger_rows(np.concatenate([gone_ids, changed_ids]), ledger_dir))
+    if len(fresh):
+        moments.update(fresh)
+        write_ledger([fresh], ledger_dir)
+    np.save(ids_path, ids)
+    np.save(hashes_path, np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64))
+    moments.save(moments_path)
+    return moments, len(fresh) - len(changed_ids), len(changed_ids), len(gone_ids)
+
+def report(moments, check=False):
+    fm = features.load() if check else None
+    for label, columns in MODELS.items():
+        est = moments.fit(columns)
+        print(f"{label}: origin {est.params['origin_natural']:.4f} (HC1 SE {est.bse['origin_natural']:.4f}), "
+              f"R-squared {est.rsquared:.4f}, n = {est.nobs:.0f}")
+        if check:
+            reference = ols.fit(fm, columns)
+            print(f"  vs ols.py: max |coef diff| {(est.params - reference.params).abs().max():.1e}, "
+                  f"R-squared diff {abs(est.rsquared - reference.rsquared):.1e}, "
+                  f"HC1 / HC3 SE {(est.bse / reference.bse).min():.4f}-{(est.bse / reference.bse).max():.4f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Models 2-4 from mergeable sufficient statistics")
+    parser.add_argument("command", choices=["build", "refresh", "fit"])
+    parser.add_argument("--jobs", type=int, default=1, help="build: shards fitted in parallel processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--check", action="store_true", help="fit: compare with a full refit by ols.py")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "build":
+        moments, shards = build(args.jobs, args.chunk_size)
+        print(f"Built from {moments.n} rows in {shards} shards in {time.perf_counter() - start:.2f}s")
+    elif args.command == "refresh":
+        moments, added, changed, removed = refresh()
+        print(f"{added} rows added, {changed} changed, {removed} removed in "
+              f"{time.perf_counter() - start:.2f}s: {moments.n} rows")
+    else:
+        moments = Moments.load(state_paths()[0])
+    report(moments, check=args.check)
@@ -0,0 +1,200 @@
+import bisect
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+# Crawl telemetry shared by the scrapers and transport.py. Every request is
+# recorded against a slice label (a diamond slice, a subreddit/query pair):
+# latency histogram, bytes received, outcome, retries, and time spent
+# waiting (pacing, token bucket, backoff, captcha cool-down, and in async mode
+# the queue for a concurrency slot, summed over tasks). The scrapers
+# add items per page and parse time. report() is a JSON-ready summary with
+# per-slice breakdowns; progress=True keeps a live status line on stderr.
+
+# Upper bucket bounds in milliseconds; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th value
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.bounds + (self.max,), self.counts):
+            if count and seen + count >= rank:
+                upper = min(upper, self.max)
+                return round(lower + (upper - lower) * (rank - seen) / count, 1)
+            seen += count
+            lower = upper
+        return round(self.max, 1)
+
+    def summary(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 1),
+            "buckets": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+class SliceStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.requests = 0
+        self.cached = 0
+        self.bytes = 0
+        self.errors = 0
+        self.retries = 0
+        self.captchas = 0
+        self.statuses = defaultdict(int)
+        self.pages = 0
+        self.items = 0
+        self.parse_s = 0.0
+        self.sleep_s = defaultdict(float)
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "cached": self.cached,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "retries": self.retries,
+            "captchas": self.captchas,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            "latency_ms": self.latency.summary(),
+            "pages": self.pages,
+            "items": self.items,
+            "items_per_page": round(self.items / self.pages, 1) if self.pages else None,
+            "parse_s": round(self.parse_s, 3),
+            "sleep_s": {reason: round(seconds, 3) for reason, seconds in sorted(self.sleep_s.items())},
+        }
+
+class Telemetry:
+    def __init__(self, progress=False, progress_every=0.5, stream=sys.stderr):
+        self.slices = defaultdict(SliceStats)
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.progress = progress
+        self.progress_every = progress_every
+        self.stream = stream
+        self.last_progress = 0.0
+        self.totals = SliceStats()
+
+    # ── recording ────────────────────────────────────────────────
+    def request(self, label, seconds, nbytes=0, status=None, outcome="ok"):
+        for stats in (self.slices[label or "other"], self.totals):
+            stats.requests += 1
+            stats.latency.add(seconds * 1000)
+            stats.bytes += nbytes
+            stats.statuses["error" if status is None else status] += 1
+            if outcome == "captcha":
+                stats.captchas += 1
+            elif outcome not in ("ok", "fail"):
+                stats.errors += 1
+        self.tick()
+
+    def cached(self, label, nbytes=0):
+        for stats in (self.slices[label or "other"], self.totals):
+            stats.cached += 1
+            stats.bytes += nbytes
+        self.tick()
+
+    def retry(self, label):
+        self.slices[label or "other"].retries += 1
+        self.totals.retries += 1
+
+    def slept(self, label, reason, seconds):
+        if seconds > 0:
+            self.slices[label or "other"].sleep_s[reason] += seconds
+            self.totals.sleep_s[reason] += seconds
+
+    def sleep(self, label, reason, seconds):
+        time.sleep(seconds)
+        self.slept(label, reason, seconds)
+
+    def page(self, label, items, parse_seconds):
+        for stats in (self.slices[label or "other"], self.totals):
+            stats.pages += 1
+            stats.items += items
+            stats.parse_s += parse_seconds
+
+    # ── output ───────────────────────────────────────────────────
+    def elapsed(self):
+        return time.perf_counter() - self.clock
+
+    def progress_line(self):
+        t = self.totals
+        elapsed = max(self.elapsed(), 1e-9)
+        p50, p90 = t.latency.quantile(0.5), t.latency.quantile(0.9)
+        latency = f"p50 {p50:.0f}ms p90 {p90:.0f}ms" if t.latency.count else "no live requests"
+        return (f"{elapsed:6.1f}s  {t.requests + t.cached} req ({t.requests / elapsed:.1f}/s live, "
+                f"{t.cached} cached)  {t.bytes / 1e6:.1f} MB  {t.pages} pages  {t.items} items  "
+                f"{latency}  {t.retries} retries  {t.errors} errors")
+
+    def tick(self, force=False):
+        if not self.progress:
+            return
+        now = time.perf_counter()
+        if force or now - self.last_progress >= self.progress_every:
+            self.last_progress = now
+            self.stream.write("\r\033[K" + self.progress_line())
+            self.stream.flush()
+
+    def close(self):
+        if self.progress:
+            self.tick(force=True)
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def report(self, **meta):
+        elapsed = self.elapsed()
+        totals = self.totals.summary()
+        totals["requests_per_s"] = round(self.totals.requests / elapsed, 2) if elapsed else None
+        totals["items_per_s"] = round(self.totals.items / elapsed, 1) if elapsed else None
+        return {
+            "started": self.started,
+            "elapsed_s": round(elapsed, 3),
+            **meta,
+            "totals": totals,
+            "slices": {label: stats.summary() for label, stats in sorted(self.slices.items())},
+        }
+
+    def write(self, path, **meta):
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.report(**meta), f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def summary_line(self):
+        t = self.totals
+        p50 = t.latency.quantile(0.5)
+        latency = f", p50 latency {p50:.0f}ms" if p50 is not None else ""
+        sleep = sum(seconds for reason, seconds in t.sleep_s.items() if reason != "queue")
+        return (f"telemetry: {t.requests} live + {t.cached} cached requests, {t.bytes / 1e6:.1f} MB{latency}, "
+                f"{t.retries} retries, {sleep:.1f}s asleep, {t.parse_s:.2f}s parsing")
+
+def add_arguments(parser):
+    parser.add_argument("--report", help="write a JSON telemetry report (latency, bytes, yield per slice) here")
+    parser.add_argument("--progress", action="store_true", help="show a live progress line on stderr")
+
+def from_args(args):
+    return Telemetry(progress=args.progress)
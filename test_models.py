@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import features
+import fixed_effects
+import ols
+from features import MODEL1_COLUMNS, MODEL2_COLUMNS, MODEL3_COLUMNS, MODEL4_COLUMNS
+from suffstats import Moments
+
+sm = pytest.importorskip("statsmodels.api")
+
+# The hand-rolled estimators against statsmodels on a small synthetic
+# diamonds_clean: heteroskedastic errors, every grade and bunching column
+# varying, both origins.
+#
+#   python -m pytest -q test_models.py
+
+N = 3000
+
+@pytest.fixture(scope="module")
+def clean():
+    rng = np.random.default_rng(0)
+    is_lab = rng.random(N) < 0.4
+    carat = np.round(rng.uniform(0.3, 3.2, N), 2)
+    color = rng.integers(1, 6, N)
+    clarity = rng.integers(1, 5, N)
+    cut = rng.integers(0, 5, N)
+    noise = rng.normal(0, 0.1 + 0.2 * carat / 3.2, N)
+    ln_price = 7 + 1.8 * np.log(carat) + 0.05 * color + 0.08 * clarity + 1.2 * ~is_lab + noise
+    return pd.DataFrame({
+        "productID": np.arange(N), "price_usd": np.round(np.exp(ln_price)).astype(np.int64),
+        "is_lab": is_lab, "carat": carat, "cut_id": cut, "color_id": color, "clarity_id": clarity,
+        "lab_cert": np.where(rng.random(N) < 0.5, "GIA", "IGI"),
+        "fluorescence": rng.choice(["NN", "F", "M", "S", "VSB"], N),
+    })
+
+@pytest.fixture(scope="module")
+def fm(clean):
+    return features.build(clean)
+
+def reference(fm, columns, mask=None, cov_type="HC3"):
+    return sm.OLS(fm.y(mask), fm.design(columns, mask)).fit(cov_type=cov_type)
+
+def assert_matches(fit, ref, rtol=1e-8):
+    np.testing.assert_allclose(fit.params[ref.params.index], ref.params, rtol=rtol, atol=1e-10)
+    np.testing.assert_allclose(fit.bse[ref.bse.index], ref.bse, rtol=rtol)
+    assert fit.rsquared == pytest.approx(ref.rsquared, rel=rtol)
+
+# ── ols.py ───────────────────────────────────────────────────────────
+
+def test_fit_many_nested(fm):
+    specs = [MODEL2_COLUMNS, MODEL3_COLUMNS, MODEL4_COLUMNS]
+    for fit, spec in zip(ols.fit_many(fm, specs), specs):
+        assert_matches(fit, reference(fm, spec))
+
+def test_fit_many_masked(fm):
+    natural = ~fm.extras["is_lab"]
+    fit = ols.fit_many(fm, [MODEL1_COLUMNS], natural)[0]
+    assert fit.nobs == natural.sum()
+    assert_matches(fit, reference(fm, MODEL1_COLUMNS, natural))
+
+def test_fit_many_not_nested(fm):
+    specs = [["ln_carat", "color_id", "origin_natural"], ["clarity_id", "ln_carat", "cut_encoded"]]
+    fits = ols.fit_many(fm, specs)
+    for fit, spec in zip(fits, specs):
+        assert fit.columns == ["const"] + spec
+        assert_matches(fit, reference(fm, spec))
+
+# ── suffstats.py ─────────────────────────────────────────────────────
+
+def test_moments_fit(clean, fm):
+    fit = Moments().update(clean).fit(MODEL4_COLUMNS)
+    assert fit.nobs == N
+    assert_matches(fit, reference(fm, MODEL4_COLUMNS, cov_type="HC1"))
+
+def test_moments_merge_and_downdate(clean):
+    full = Moments().update(clean)
+    merged = Moments().update(clean[:1000]).merge(Moments().update(clean[1000:]))
+    # Fold in everything plus a repriced copy of some rows, then take the copies back out
+    repriced = clean[:500].assign(price_usd=clean["price_usd"][:500] * 2)
+    downdated = Moments().update(clean).update(repriced).downdate(repriced)
+    for moments in (merged, downdated):
+        assert moments.n == full.n
+        np.testing.assert_allclose(moments.cross, full.cross, rtol=1e-10)
+        np.testing.assert_allclose(moments.fourth, full.fourth, rtol=1e-8)
+        fit, expected = moments.fit(MODEL3_COLUMNS), full.fit(MODEL3_COLUMNS)
+        np.testing.assert_allclose(fit.params, expected.params, rtol=1e-8)
+        np.testing.assert_allclose(fit.bse, expected.bse, rtol=1e-6)
+
+def test_moments_merge_columns(clean):
+    with pytest.raises(ValueError):
+        Moments().merge(Moments(MODEL3_COLUMNS))
+
+# ── fixed_effects.py ─────────────────────────────────────────────────
+
+def dummies(fm, absorb):
+    # Regressors plus one dummy per absorbed level (first level of each factor dropped)
+    X = fm.design(fixed_effects.REGRESSORS)
+    for name in absorb:
+        codes = fixed_effects.factor_codes(fm, fixed_effects.FACTORS[name])
+        X = X.join(pd.get_dummies(codes, prefix=name, drop_first=True, dtype=float))
+    return X
+
+def test_fixed_effects_params(fm):
+    est, iterations = fixed_effects.fit(fm)
+    ref = sm.OLS(fm.y(), dummies(fm, fixed_effects.ABSORB)).fit()
+    np.testing.assert_allclose(est.params, ref.params[fixed_effects.REGRESSORS], rtol=1e-6)
+    assert est.ssr == pytest.approx(ref.ssr, rel=1e-8)
+    assert est.rsquared == pytest.approx(ref.rsquared, rel=1e-8)
+    assert est.df_resid == ref.df_resid
+
+def test_fixed_effects_cluster_errors(fm):
+    # Fluorescence is not nested in colour, so the dummies count toward K in both
+    est, iterations = fixed_effects.fit(fm, absorb=["fluorescence"], cluster="color")
+    assert iterations == 1
+    groups = fixed_effects.factor_codes(fm, fixed_effects.FACTORS["color"])
+    ref = sm.OLS(fm.y(), dummies(fm, ["fluorescence"])).fit(cov_type="cluster", cov_kwds={"groups": groups})
+    np.testing.assert_allclose(est.params, ref.params[fixed_effects.REGRESSORS], rtol=1e-8)
+    np.testing.assert_allclose(est.bse, ref.bse[fixed_effects.REGRESSORS], rtol=1e-8)
+
+# The explicit dummies are collinear on purpose
+@pytest.mark.filterwarnings("ignore:The design matrix is rank-deficient")
+@pytest.mark.parametrize("absorb", [["cell", "color"], ["clarity", "cell", "fluorescence"]])
+def test_fixed_effects_nested_factors(fm, absorb):
+    # Colour and clarity levels are unions of grade cells, so their dummies
+    # add nothing to the cell dummies' span
+    est, iterations = fixed_effects.fit(fm, absorb=absorb, cluster="color")
+    ref = sm.OLS(fm.y(), dummies(fm, absorb)).fit()
+    np.testing.assert_allclose(est.params, ref.params[fixed_effects.REGRESSORS], rtol=1e-6)
+    assert est.df_resid == ref.df_resid
+    assert est.rsquared_adj == pytest.approx(ref.rsquared_adj, rel=1e-8)
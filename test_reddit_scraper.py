@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pandas as pd
+
+import reddit_harvester
+from reddit_scraper import load_watermarks, pair_key, scrape_subreddit_query
+from telemetry import Telemetry
+
+# Watermarks on pairs with more search results than max_posts: the first run
+# sets a mark at its cut, and later incremental runs stop at the mark.
+#
+#   python -m pytest -q test_reddit_scraper.py
+
+SUBREDDIT, QUERY = 'Diamonds', 'lab grown diamond'
+KEY = pair_key(SUBREDDIT, QUERY)
+START = 1.6e9
+
+class Response:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {'data': self.data}
+
+class FakeSearch:
+    # Newest-first search results, 100 per page, paged by 'after'
+    def __init__(self, count):
+        self.created = [START + i * 3600 for i in range(count)]
+        self.requests = 0
+        self.telemetry = Telemetry()
+
+    def publish(self, count):
+        last = self.created[-1]
+        self.created += [last + (i + 1) * 3600 for i in range(count)]
+
+    def get(self, url, params=None, label=None):
+        self.requests += 1
+        posts = sorted(self.created, reverse=True)
+        start = int(params.get('after', 0))
+        page = posts[start:start + params['limit']]
+        children = [{'data': {'id': f'{int(created):x}', 'created_utc': created, 'title': 'post'}}
+                    for created in page]
+        after = str(start + len(page)) if start + len(page) < len(posts) else None
+        return Response({'children': children, 'after': after})
+
+class AsyncFakeSearch(FakeSearch):
+    async def get(self, url, params=None, label=None):
+        return FakeSearch.get(self, url, params, label)
+
+class FailingSearch(FakeSearch):
+    # The second page fails
+    def get(self, url, params=None, label=None):
+        if 'after' in params:
+            raise ConnectionError('connection reset')
+        return FakeSearch.get(self, url, params, label)
+
+class Sink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, records):
+        self.records += records
+        return len(records)
+
+def sync_run(search, watermarks, incremental):
+    search.requests = 0
+    fetched = scrape_subreddit_query(SUBREDDIT, QUERY, Sink(), search, watermarks=watermarks, incremental=incremental)
+    return fetched, search.requests
+
+def async_run(search, watermarks, incremental):
+    search.requests = 0
+    harvester = reddit_harvester.Harvester(search, Sink(), watermarks=watermarks, incremental=incremental)
+    fetched = asyncio.run(harvester.harvest_pair(SUBREDDIT, QUERY))
+    return fetched, search.requests
+
+def test_mark_set_at_max_posts_cut():
+    for run, search in [(sync_run, FakeSearch(500)), (async_run, AsyncFakeSearch(1000))]:
+        watermarks = {}
+        assert run(search, watermarks, incremental=False) == (300, 3)
+        assert watermarks[KEY] == max(search.created)
+        for _ in range(2):
+            assert run(search, watermarks, incremental=True) == (0, 1)
+        search.publish(5)
+        assert run(search, watermarks, incremental=True) == (5, 1)
+        assert watermarks[KEY] == max(search.created)
+
+def test_cut_keeps_existing_mark():
+    # More new posts than max_posts: the ones below the cut are still due
+    search = FakeSearch(500)
+    watermarks = {KEY: START}
+    assert sync_run(search, watermarks, incremental=True) == (300, 3)
+    assert watermarks[KEY] == START
+
+def test_error_keeps_mark():
+    watermarks = {}
+    assert sync_run(FailingSearch(500), watermarks, incremental=False) == (100, 1)
+    assert KEY not in watermarks
+
+def test_missing_marks_seeded_from_corpus(tmp_path):
+    path = tmp_path / 'marks.json'
+    path.write_text(json.dumps({pair_key('jewelry', 'natural diamond'): 5.0}))
+    corpus = tmp_path / 'reddit_raw.csv'
+    pd.DataFrame({'id': ['a', 'b', 'c'], 'subreddit': [SUBREDDIT, SUBREDDIT, 'jewelry'],
+                  'query': [QUERY, QUERY, 'natural diamond'], 'created_utc': [1.0, 2.0, 9.0]}
+                 ).to_csv(corpus, index=False)
+    watermarks = load_watermarks(str(path), corpus=str(corpus))
+    # The saved mark wins; the pair missing from the file comes from the corpus
+    assert watermarks == {pair_key('jewelry', 'natural diamond'): 5.0, KEY: 2.0}
+    assert load_watermarks(str(path)) == {pair_key('jewelry', 'natural diamond'): 5.0}
@@ -0,0 +1,120 @@
+import argparse
+import mmap
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import dataset
+
+# Reddit post text kept out of the tables. Each post is one UTF-8 record,
+# title + " " + text (the full_text every text stage builds), appended to
+# reddit_text.bin; reddit_text.index.parquet maps post id to the record's
+# offset, length and title length. Readers memory-map the blob: views()
+# hands out memoryview slices without copying, full_text()/titles() decode
+# only the posts asked for. Tables downstream of reddit_raw carry no text,
+# so stages that don't need it (topic_timeseries) never touch it.
+#
+#   python textstore.py          # append posts from reddit_raw not yet stored
+
+BLOB_PATH = "reddit_text.bin"
+INDEX_PATH = "reddit_text.index.parquet"
+
+INDEX_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("offset", pa.int64()),
+    ("length", pa.int32()),
+    ("title_length", pa.int32()),
+])
+
+class TextStore:
+    def __init__(self, path=BLOB_PATH, index_path=INDEX_PATH):
+        self.path = path
+        self.index_path = index_path
+        self.blob = None
+        self.open()
+
+    def open(self):
+        self.close()
+        if os.path.exists(self.index_path):
+            index = pq.read_table(self.index_path)
+        else:
+            index = INDEX_SCHEMA.empty_table()
+        self.ids = pd.Index(index.column("id").to_pandas())
+        self.offsets = index.column("offset").to_numpy()
+        self.lengths = index.column("length").to_numpy()
+        self.title_lengths = index.column("title_length").to_numpy()
+        if len(self.ids) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self.blob is not None:
+            self.blob.close()
+            self.blob = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, ids):
+        rows = self.ids.get_indexer(pd.Index(ids))
+        if (rows < 0).any():
+            missing = pd.Index(ids)[rows < 0]
+            raise KeyError(f"{len(missing)} posts not in {self.index_path} (e.g. {missing[0]}) - run textstore.py")
+        return rows
+
+    def views(self, ids):
+        # Zero-copy memoryview of each post's full_text bytes
+        rows = self.rows(ids)
+        blob = memoryview(self.blob) if self.blob is not None else memoryview(b"")
+        return [blob[start:start + length]
+                for start, length in zip(self.offsets[rows].tolist(), self.lengths[rows].tolist())]
+
+    def full_text(self, ids):
+        # title + " " + text, as a Series aligned with ids
+        return pd.Series([str(view, "utf-8") for view in self.views(ids)], index=getattr(ids, "index", None))
+
+    def titles(self, ids):
+        title_lengths = self.title_lengths[self.rows(ids)].tolist()
+        return pd.Series([str(view[:n], "utf-8") for view, n in zip(self.views(ids), title_lengths)],
+                         index=getattr(ids, "index", None))
+
+    def append(self, df):
+        # Adds posts (id, title, text) whose id isn't stored yet; returns how many
+        df = df[~df["id"].isin(self.ids)].drop_duplicates("id")
+        if not len(df):
+            return 0
+        titles = [title.encode("utf-8") for title in df["title"].fillna("")]
+        records = [title + b" " + text.encode("utf-8") for title, text in zip(titles, df["text"].fillna(""))]
+        lengths = np.array([len(record) for record in records], dtype=np.int64)
+        # Append after whatever is on disk: bytes left by an interrupted append are never indexed
+        start = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with open(self.path, "ab") as f:
+            f.write(b"".join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        added = pa.table({
+            "id": pa.array(df["id"].astype(str).tolist(), pa.string()),
+            "offset": pa.array(start + np.concatenate([[0], np.cumsum(lengths)[:-1]]), pa.int64()),
+            "length": pa.array(lengths, pa.int32()),
+            "title_length": pa.array([len(title) for title in titles], pa.int32()),
+        })
+        index = pa.concat_tables([pq.read_table(self.index_path), added]) if os.path.exists(self.index_path) else added
+        pq.write_table(index, self.index_path + ".tmp", compression="zstd")
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.open()
+        return len(df)
+
+def main():
+    store = TextStore()
+    before = len(store)
+    added = store.append(dataset.load("reddit_raw", columns=["id", "title", "text"]))
+    size = os.path.getsize(store.path) if os.path.exists(store.path) else 0
+    print(f"{added} posts appended ({before} already stored): {len(store)} posts, "
+          f"{size / 1e6:.1f} MB in {store.path}")
+    store.close()
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Append new Reddit post text to the memory-mapped text store").parse_args()
+    main()
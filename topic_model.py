@@ -1,28 +1,16 @@
+import argparse
+import re
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
 import warnings
-warnings.filterwarnings('ignore')
-
-df = pd.read_csv('reddit_sentiment.csv')
-df['date'] = pd.to_datetime(df['date'])
-df['full_text'] = df['title'] + ' ' + df['text'].fillna('')
-print(f"Loaded {len(df)} posts")
-
-# ── CLEAN TEXT ───────────────────────────────────────────────────
-import re
 
-def clean_text(text):
-    text = str(text).lower()
-    text = re.sub(r'http\S+', '', text)
-    text = re.sub(r'[^a-z\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+import dataset
+from session import Session
 
-df['clean_text'] = df['full_text'].apply(clean_text)
+# LDA topics over the Reddit posts (reddit_topics). No figure here; sklearn
+# is imported when the model is fitted, and a shared session keeps the
+# document-term matrix and fitted model. --no-plots is accepted so every
+# analysis script takes the same flags.
 
 # Custom stopwords for diamond context
 STOP_WORDS = [
@@ -35,41 +23,6 @@ STOP_WORDS = [
     'good', 'great', 'love', 'nice', 'beautiful', 'pretty', 'wow'
 ]
 
-# ── FIT LDA MODEL ────────────────────────────────────────────────
-vectorizer = CountVectorizer(
-    max_features=1000,
-    min_df=5,
-    max_df=0.85,
-    stop_words='english',
-    ngram_range=(1, 2)
-)
-
-# Remove custom stopwords from text before vectorizing
-def remove_custom_stops(text):
-    words = text.split()
-    return ' '.join([w for w in words if w not in STOP_WORDS])
-
-df['clean_text'] = df['clean_text'].apply(remove_custom_stops)
-dtm = vectorizer.fit_transform(df['clean_text'])
-
-print("Fitting LDA model with 8 topics...")
-lda = LatentDirichletAllocation(
-    n_components=8,
-    random_state=42,
-    max_iter=20,
-    learning_method='batch'
-)
-lda.fit(dtm)
-
-# ── PRINT TOP WORDS PER TOPIC ────────────────────────────────────
-feature_names = vectorizer.get_feature_names_out()
-
-print("\nTop words per topic:")
-print("="*60)
-for topic_idx, topic in enumerate(lda.components_):
-    top_words = [feature_names[i] for i in topic.argsort()[:-15:-1]]
-    print(f"Topic {topic_idx}: {', '.join(top_words)}")
-
 # Manually label topics based on top words
 # (update these labels after seeing the output)
 TOPIC_LABELS = {
@@ -83,18 +36,88 @@ TOPIC_LABELS = {
     7: 'Topic 7',
 }
 
-# Get topic proportions for each post
-doc_topics = lda.transform(dtm)
-df['dominant_topic'] = doc_topics.argmax(axis=1)
-for i in range(8):
-    df[f'topic_{i}_prop'] = doc_topics[:, i]
-
-# ── TOPIC DISTRIBUTION ───────────────────────────────────────────
-print("\nTopic distribution across all posts:")
-print(df['dominant_topic'].value_counts().sort_index())
-
-# Save
-df.to_csv('reddit_topics.csv', index=False)
-print("\nSaved to reddit_topics.csv")
-print("\nNow read the topic words above and tell me what labels to assign each topic.")
-print("Example: Topic 0 = 'Price/Value', Topic 1 = 'Ethics/Mining', etc.")
\ No newline at end of file
+# ── CLEAN TEXT ───────────────────────────────────────────────────
+def clean_text(text):
+    text = str(text).lower()
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'[^a-z\s]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+# Remove custom stopwords from text before vectorizing
+def remove_custom_stops(text):
+    words = text.split()
+    return ' '.join([w for w in words if w not in STOP_WORDS])
+
+def fit_lda(texts):
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.decomposition import LatentDirichletAllocation
+
+    # ── FIT LDA MODEL ────────────────────────────────────────────────
+    vectorizer = CountVectorizer(
+        max_features=1000,
+        min_df=5,
+        max_df=0.85,
+        stop_words='english',
+        ngram_range=(1, 2)
+    )
+
+    dtm = vectorizer.fit_transform(texts)
+
+    print("Fitting LDA model with 8 topics...")
+    lda = LatentDirichletAllocation(
+        n_components=8,
+        random_state=42,
+        max_iter=20,
+        learning_method='batch'
+    )
+    lda.fit(dtm)
+    return vectorizer, lda, dtm
+
+def fit_topics(df, session):
+    df['clean_text'] = df['clean_text'].apply(remove_custom_stops)
+    vectorizer, lda, dtm = session.get("lda", lambda: fit_lda(df['clean_text']))
+
+    # ── PRINT TOP WORDS PER TOPIC ────────────────────────────────────
+    feature_names = vectorizer.get_feature_names_out()
+
+    print("\nTop words per topic:")
+    print("="*60)
+    for topic_idx, topic in enumerate(lda.components_):
+        top_words = [feature_names[i] for i in topic.argsort()[:-15:-1]]
+        print(f"Topic {topic_idx}: {', '.join(top_words)}")
+
+    # Get topic proportions for each post
+    doc_topics = lda.transform(dtm)
+    df['dominant_topic'] = doc_topics.argmax(axis=1)
+    for i in range(dataset.N_TOPICS):
+        df[f'topic_{i}_prop'] = doc_topics[:, i]
+    return df
+
+def main(plots=True, session=None):
+    warnings.filterwarnings('ignore')
+    session = session or Session()
+    df = session.load('reddit_sentiment')
+    df['date'] = pd.to_datetime(df['date'])
+    df['full_text'] = session.text().full_text(df['id'])
+    print(f"Loaded {len(df)} posts")
+
+    df['clean_text'] = df['full_text'].apply(clean_text)
+    df = fit_topics(df, session)
+
+    # ── TOPIC DISTRIBUTION ───────────────────────────────────────────
+    print("\nTopic distribution across all posts:")
+    print(df['dominant_topic'].value_counts().sort_index())
+
+    # Save
+    path = session.save(df, 'reddit_topics')
+    print(f"\nSaved to {path}")
+    print("\nNow read the topic words above and tell me what labels to assign each topic.")
+    print("Example: Topic 0 = 'Price/Value', Topic 1 = 'Ethics/Mining', etc.")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LDA topic model over the Reddit posts")
+    parser.add_argument("--no-plots", action="store_true", help="no effect (this stage draws no figures)")
+    args = parser.parse_args()
+    main(plots=not args.no_plots)
@@ -0,0 +1,297 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from http_cache import CachedResponse
+from telemetry import Telemetry
+
+# Shared HTTP transport for the scrapers: one keep-alive session per scraper,
+# retries with full-jitter exponential backoff (honouring Retry-After on
+# 429/503), and bot-wall detection. The James Allen API answers blocked
+# clients with a Radware captcha page (see page_source.html) instead of JSON;
+# that puts the transport into a cool-down shared by every request rather
+# than failing the slice. Requests carry a slice label for telemetry.py, which
+# records latency, bytes, outcomes and every second spent waiting.
+
+CAPTCHA_MARKERS = (b"captcha", b"perfdrive", b"shieldsquare", b"radware")
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+class TransportError(Exception):
+    pass
+
+class BlockedError(TransportError):
+    pass
+
+def is_captcha(content, content_type=""):
+    if "json" in content_type:
+        return False
+    head = content[:8192].lower()
+    return any(marker in head for marker in CAPTCHA_MARKERS)
+
+def is_json(content, content_type=""):
+    if "json" in content_type:
+        return True
+    return content[:64].lstrip()[:1] in (b"{", b"[")
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base=0.5, cap=60.0, retry_after=None):
+    if retry_after is not None:
+        return min(cap, retry_after) + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def classify(status, content, content_type, expect_json=True):
+    # -> "ok", "retry", "captcha" or "fail"
+    if is_captcha(content, content_type):
+        return "captcha"
+    if status in RETRY_STATUSES:
+        return "retry"
+    if status != 200:
+        return "fail"
+    if expect_json and not is_json(content, content_type):
+        return "retry"
+    return "ok"
+
+def wire_params(params):
+    # aiohttp rejects bools in query strings; send them the way requests does
+    if not params:
+        return params
+    return {key: str(value) if isinstance(value, bool) else value for key, value in params.items()}
+
+class CoolDown:
+    # Shared pause after a captcha; doubles on each consecutive hit
+    def __init__(self, base=60.0, cap=900.0, max_strikes=5):
+        self.base = base
+        self.cap = cap
+        self.max_strikes = max_strikes
+        self.strikes = 0
+        self.until = 0.0
+
+    def trip(self):
+        self.strikes += 1
+        if self.strikes > self.max_strikes:
+            raise BlockedError(f"still served a captcha after {self.max_strikes} cool-downs")
+        duration = min(self.cap, self.base * 2 ** (self.strikes - 1))
+        self.until = max(self.until, time.monotonic() + duration)
+        print(f"  Captcha page detected - cooling down for {duration:.0f}s (strike {self.strikes})")
+
+    def clear(self):
+        self.strikes = 0
+
+    def remaining(self):
+        return max(0.0, self.until - time.monotonic())
+
+class TokenBucket:
+    # Allows `rate` requests per second on average, with bursts up to `burst`
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = None
+
+    def take(self):
+        # Returns 0 if a token was taken, else seconds until one is available
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while (wait := self.take()) > 0:
+                await asyncio.sleep(wait)
+
+class Transport:
+    # Blocking transport over a pooled requests.Session
+    def __init__(self, headers=None, cache=None, max_retries=5, pool_size=10, timeout=30,
+                 min_interval=0.0, cooldown=60.0, telemetry=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self.cache = cache
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.cooldown = CoolDown(cooldown)
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.last_request = 0.0
+        self.requests = 0
+        self.retries = 0
+
+    def close(self):
+        self.session.close()
+
+    def pace(self, label=None):
+        cooldown = self.cooldown.remaining()
+        wait = max(cooldown, self.last_request + self.min_interval - time.monotonic())
+        if wait > 0:
+            self.telemetry.sleep(label, "cooldown" if cooldown >= wait else "pace", wait)
+        self.last_request = time.monotonic()
+
+    def request(self, method, url, params=None, json=None, expect_json=True, label=None):
+        if self.cache is not None:
+            cached = self.cache.get(method, url, params=params, json_body=json)
+            if cached is not None:
+                self.telemetry.cached(label, len(cached.content))
+                return cached
+
+        import requests
+
+        # Captcha cool-downs have their own budget and don't count as attempts
+        attempt = 0
+        while attempt <= self.max_retries:
+            self.pace(label)
+            self.requests += 1
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, json=json, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                outcome, retry_after = "retry", None
+                self.telemetry.request(label, time.perf_counter() - start, outcome=outcome)
+            else:
+                outcome = classify(response.status_code, response.content,
+                                   response.headers.get("content-type", ""), expect_json)
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                error = f"status {response.status_code}"
+                self.telemetry.request(label, time.perf_counter() - start, len(response.content),
+                                       response.status_code, outcome)
+
+            if outcome in ("ok", "fail"):
+                self.cooldown.clear()
+                if self.cache is not None:
+                    self.cache.put(method, url, response.status_code, response.content, params=params, json_body=json)
+                return CachedResponse(response.status_code, response.content, url, from_cache=False)
+            if outcome == "captcha":
+                self.cooldown.trip()
+                continue
+
+            self.retries += 1
+            self.telemetry.retry(label)
+            delay = backoff_delay(attempt, retry_after=retry_after)
+            attempt += 1
+            print(f"  {method} {url}: {error}, retrying in {delay:.1f}s")
+            self.telemetry.sleep(label, "backoff", delay)
+
+        raise TransportError(f"{method} {url} failed after {self.max_retries + 1} attempts: {error}")
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, json=None, **kwargs):
+        return self.request("POST", url, json=json, **kwargs)
+
+class AsyncTransport:
+    # aiohttp counterpart; concurrency, rate and cool-down are shared by all tasks
+    def __init__(self, headers=None, cache=None, max_retries=5, concurrency=8, rate=4.0, timeout=30,
+                 cooldown=60.0, telemetry=None):
+        self.headers = headers
+        self.cache = cache
+        self.max_retries = max_retries
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate)
+        self.cooldown = CoolDown(cooldown)
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.session = None
+        self.requests = 0
+        self.retries = 0
+
+    async def __aenter__(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def request(self, method, url, params=None, json=None, expect_json=True, label=None):
+        if self.cache is not None:
+            cached = self.cache.get(method, url, params=params, json_body=json)
+            if cached is not None:
+                self.telemetry.cached(label, len(cached.content))
+                return cached
+
+        import aiohttp
+
+        telemetry = self.telemetry
+        attempt = 0
+        while attempt <= self.max_retries:
+            queued = time.perf_counter()
+            async with self.semaphore:
+                telemetry.slept(label, "queue", time.perf_counter() - queued)
+                while (wait := self.cooldown.remaining()) > 0:
+                    await asyncio.sleep(wait)
+                    telemetry.slept(label, "cooldown", wait)
+                waited = time.perf_counter()
+                await self.bucket.acquire()
+                telemetry.slept(label, "rate", time.perf_counter() - waited)
+                self.requests += 1
+                start = time.perf_counter()
+                try:
+                    async with self.session.request(method, url, params=wire_params(params), json=json) as response:
+                        status = response.status
+                        content = await response.read()
+                        content_type = response.headers.get("content-type", "")
+                        retry_after = parse_retry_after(response.headers.get("retry-after"))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+                    outcome, retry_after = "retry", None
+                    telemetry.request(label, time.perf_counter() - start, outcome=outcome)
+                else:
+                    outcome = classify(status, content, content_type, expect_json)
+                    error = f"status {status}"
+                    telemetry.request(label, time.perf_counter() - start, len(content), status, outcome)
+
+            if outcome in ("ok", "fail"):
+                self.cooldown.clear()
+                if self.cache is not None:
+                    self.cache.put(method, url, status, content, params=params, json_body=json)
+                return CachedResponse(status, content, url, from_cache=False)
+            if outcome == "captcha":
+                if self.cooldown.remaining() == 0:
+                    self.cooldown.trip()
+                continue
+
+            self.retries += 1
+            telemetry.retry(label)
+            delay = backoff_delay(attempt, retry_after=retry_after)
+            attempt += 1
+            print(f"  {method} {url}: {error}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            telemetry.slept(label, "backoff", delay)
+
+        raise TransportError(f"{method} {url} failed after {self.max_retries + 1} attempts: {error}")
+
+    async def get(self, url, params=None, **kwargs):
+        return await self.request("GET", url, params=params, **kwargs)
+
+    async def post(self, url, json=None, **kwargs):
+        return await self.request("POST", url, json=json, **kwargs)